@@ -0,0 +1,142 @@
+"""
+Hub de difusão dos eventos (logs e progresso) para os clientes SSE
+"""
+import asyncio
+from collections import deque
+from typing import Deque, List, Optional, Set, Union
+from backend.models.config import LogEntry
+from backend.api.log_history import LogHistory
+
+# Log (LogEntry com seq) ou progresso (dict)
+Event = Union[LogEntry, dict]
+
+
+class Subscription:
+    """Fila limitada de um cliente: cheia, descarta o evento mais antigo (cliente lento não segura os demais)"""
+
+    def __init__(self, maxlen: int):
+        self._events: Deque[Event] = deque(maxlen=maxlen)
+        self._ready = asyncio.Event()
+        self.dropped = 0  # Eventos descartados por este cliente não acompanhar
+        self.replayed_seq = 0  # Logs até este seq já vieram do histórico (ignora os repetidos)
+
+    def push(self, event: Event):
+        if isinstance(event, LogEntry) and event.seq is not None and event.seq <= self.replayed_seq:
+            return
+        if len(self._events) == self._events.maxlen:
+            self.dropped += 1
+        self._events.append(event)
+        self._ready.set()
+
+    async def wait(self, timeout: Optional[float] = None) -> List[Event]:
+        """Aguarda eventos e retorna todos os que estiverem pendentes ([] se o tempo acabar)"""
+        if not self._events:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        return self.drain()
+
+    def drain(self) -> List[Event]:
+        """Retira todos os eventos pendentes, sem aguardar"""
+        events = list(self._events)
+        self._events.clear()
+        self._ready.clear()
+        return events
+
+
+class BroadcastHub:
+    """Entrega cada evento a todos os clientes inscritos
+
+    Sem inscritos, publicar não guarda nada (o histórico de logs já fica no LogHistory).
+    Deve ser usado no loop da API.
+    """
+
+    def __init__(self, history: LogHistory, queue_size: int = 256):
+        self.history = history
+        self.queue_size = max(1, queue_size)
+        self._subscribers: Set[Subscription] = set()
+
+    def subscribe(self, since: Optional[int] = None) -> Subscription:
+        """Inscreve um cliente; com `since`, reenvia os logs do histórico com seq maior que ele
+
+        Um `since` maior que o último seq veio de antes de um reinício do backend (a
+        numeração recomeçou): o histórico inteiro é reenviado. Logs ainda a caminho
+        do hub (já no histórico) não são entregues de novo. Se o
+        reenvio não couber na fila, vão os mais recentes, precedidos de um evento
+        `replay_truncated` com o intervalo omitido (disponível em /api/logs/history).
+        """
+        subscription = Subscription(self.queue_size)
+        if since is not None:
+            last_seq = self.history.last_seq
+            if since > last_seq:
+                since = 0  # seq de antes do reinício
+            entries = self.history.since(since)
+            if len(entries) > self.queue_size:
+                keep = self.queue_size - 1  # Uma posição para o aviso
+                skipped = entries[:len(entries) - keep]
+                subscription.push({
+                    "type": "replay_truncated",
+                    "since": since,
+                    "until": skipped[-1].seq,
+                    "skipped": len(skipped),
+                })
+                entries = entries[len(entries) - keep:] if keep else []
+            for entry in entries:
+                subscription.push(entry)
+            subscription.replayed_seq = max(last_seq, entries[-1].seq if entries else 0)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+
+    def publish(self, event: Event):
+        for subscription in self._subscribers:
+            subscription.push(event)
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+
+class EventHandoff:
+    """Passagem dos eventos de qualquer thread para o hub, no loop da API
+
+    Cada evento é só um append numa deque limitada (atômico, sem lock); o primeiro
+    evento de uma rajada agenda, com um único call_soon_threadsafe, o esvaziamento
+    da deque no loop. Nunca cria threads nem loops. Cheia, descarta o mais antigo.
+    """
+
+    def __init__(self, hub: BroadcastHub, maxlen: int = 1024):
+        self.hub = hub
+        self._buffer: Deque[Event] = deque(maxlen=max(1, maxlen))
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._scheduled = False
+        self.dropped = 0  # Eventos descartados com o buffer cheio (loop atrasado)
+
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        """Define o loop da API (uma vez, no startup)"""
+        self._loop = loop
+
+    def put(self, event: Event):
+        loop = self._loop
+        if loop is None or not self.hub.subscribers:
+            return
+        buffer = self._buffer
+        if len(buffer) == buffer.maxlen:
+            self.dropped += 1
+        buffer.append(event)
+        if not self._scheduled:
+            self._scheduled = True
+            try:
+                loop.call_soon_threadsafe(self._flush)
+            except RuntimeError:
+                self._scheduled = False  # Loop encerrado
+
+    def _flush(self):
+        # Desmarca antes de esvaziar: um evento que chegar depois agenda um novo flush
+        self._scheduled = False
+        buffer = self._buffer
+        while buffer:
+            self.hub.publish(buffer.popleft())
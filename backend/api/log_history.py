@@ -0,0 +1,52 @@
+"""
+Histórico de logs em buffer circular (capacidade fixa, append O(1))
+"""
+import itertools
+from typing import List, Optional
+from backend.models.config import LogEntry
+
+
+class LogHistory:
+    """Últimos `capacity` logs, cada um com um número de sequência crescente (`seq`)
+
+    O log de número `seq` ocupa a posição `seq % capacity`; ao dar a volta, o mais
+    antigo é sobrescrito. A leitura confere o `seq` de cada posição, então não
+    precisa de lock mesmo com escritas concorrentes.
+    """
+
+    def __init__(self, capacity: int = 1000):
+        self.capacity = max(1, capacity)
+        self._slots: List[Optional[LogEntry]] = [None] * self.capacity
+        self._counter = itertools.count(1)
+        self.last_seq = 0  # seq do log mais recente (0 = nenhum)
+
+    def append(self, entry: LogEntry) -> int:
+        """Numera e guarda o log; retorna o seq atribuído"""
+        seq = next(self._counter)
+        entry.seq = seq
+        self._slots[seq % self.capacity] = entry
+        self.last_seq = seq
+        return seq
+
+    @property
+    def first_seq(self) -> int:
+        """seq do log mais antigo ainda no buffer"""
+        return max(1, self.last_seq - self.capacity + 1)
+
+    def since(self, seq: Optional[int] = None, limit: Optional[int] = None) -> List[LogEntry]:
+        """Logs com seq > `seq`, do mais antigo ao mais novo, no máximo `limit`
+
+        Sem `seq`, retorna os `limit` mais recentes.
+        """
+        last = self.last_seq
+        start = max(self.first_seq, (seq or 0) + 1)
+        if seq is None and limit:
+            start = max(start, last - limit + 1)
+        stop = last + 1 if seq is None or not limit else min(last + 1, start + limit)
+        entries = []
+        for current in range(start, stop):
+            entry = self._slots[current % self.capacity]
+            # Posição sobrescrita por um log mais novo durante a leitura: já não existe
+            if entry is not None and entry.seq == current:
+                entries.append(entry)
+        return entries
@@ -6,7 +6,9 @@ from dotenv import load_dotenv
 from pathlib import Path
 from backend.bot.telegram_bot import TelegramBot
 from backend.models.config import LogEntry
-from backend.api.routes import config_router, control_router, logs_router
+from backend.api.log_history import LogHistory
+from backend.api.broadcast import BroadcastHub, EventHandoff
+from backend.api.routes import config_router, control_router, logs_router, monitor_router
 
 # Tenta carregar o .env com diferentes encodings
 def load_env_with_encoding():
@@ -121,96 +123,65 @@ app.add_middleware(
 
 # Instância global do bot
 bot_instance: TelegramBot | None = None
+_bot_started = False
 
-# Filas para logs e progresso
-log_queue: asyncio.Queue = None
-progress_queue: asyncio.Queue = None
+# Histórico de logs (persistente durante execução): buffer circular, cada log recebe um seq
+log_history = LogHistory(int(os.getenv("LOG_HISTORY_SIZE", 1000)))
 
-# Histórico de logs (persistente durante execução)
-log_history: list[LogEntry] = []
+# Difusão para os clientes SSE: uma fila limitada por cliente, nada acumula sem clientes
+event_hub = BroadcastHub(log_history, queue_size=int(os.getenv("SSE_QUEUE_SIZE", 256)))
+# Única passagem de eventos para o loop da API (seguro de qualquer thread); o loop é definido no startup
+event_handoff = EventHandoff(event_hub, maxlen=int(os.getenv("EVENT_BUFFER_SIZE", 1024)))
 
 
 def log_callback(log_entry: LogEntry):
-    """Callback para adicionar logs na fila e histórico"""
-    global log_history
-    
-    # Adiciona ao histórico (mantém últimos 1000)
+    """Callback para adicionar logs no histórico e enviar aos clientes"""
+    # Adiciona ao histórico (o mais antigo é sobrescrito quando o buffer enche)
     log_history.append(log_entry)
-    if len(log_history) > 1000:
-        log_history = log_history[-1000:]
-    
-    if log_queue is None:
-        return
-    try:
-        # Tenta adicionar à fila de forma thread-safe
-        try:
-            loop = asyncio.get_running_loop()
-            # Se já estiver em um loop, cria uma task
-            asyncio.run_coroutine_threadsafe(log_queue.put(log_entry), loop)
-        except RuntimeError:
-            # Se não houver loop rodando, cria um novo
-            try:
-                loop = asyncio.get_event_loop()
-                if loop.is_closed():
-                    raise RuntimeError("Loop fechado")
-                loop.call_soon_threadsafe(lambda: asyncio.create_task(log_queue.put(log_entry)))
-            except:
-                # Último recurso: usa threading
-                import threading
-                def put_log():
-                    new_loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(new_loop)
-                    new_loop.run_until_complete(log_queue.put(log_entry))
-                    new_loop.close()
-                threading.Thread(target=put_log, daemon=True).start()
-    except Exception as e:
-        print(f"Erro ao adicionar log à fila: {e}")
+    event_handoff.put(log_entry)
 
 
 def progress_callback(progress: dict):
-    """Callback para adicionar progresso na fila"""
-    if progress_queue is None:
-        return
-    try:
-        try:
-            loop = asyncio.get_running_loop()
-            asyncio.run_coroutine_threadsafe(progress_queue.put(progress), loop)
-        except RuntimeError:
-            try:
-                loop = asyncio.get_event_loop()
-                if loop.is_closed():
-                    raise RuntimeError("Loop fechado")
-                loop.call_soon_threadsafe(lambda: asyncio.create_task(progress_queue.put(progress)))
-            except:
-                import threading
-                def put_progress():
-                    new_loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(new_loop)
-                    new_loop.run_until_complete(progress_queue.put(progress))
-                    new_loop.close()
-                threading.Thread(target=put_progress, daemon=True).start()
-    except Exception as e:
-        print(f"Erro ao adicionar progresso à fila: {e}")
+    """Callback para enviar progresso aos clientes"""
+    event_handoff.put({"type": "progress", **progress})
 
 
-@app.on_event("startup")
-async def startup_event():
-    """Inicializa o bot ao iniciar a aplicação"""
-    global bot_instance, log_queue, progress_queue, log_history
+async def ensure_bot_instance() -> TelegramBot | None:
+    """Cria e inicializa o bot uma única vez
+
+    Chamado no startup; sem lifespan (ex.: Vercel, api/index.py), é chamado pela rota do webhook.
+    """
+    global bot_instance, _bot_started
+    if _bot_started:
+        return bot_instance
+    _bot_started = True
     
-    # Inicializa filas
-    log_queue = asyncio.Queue()
-    progress_queue = asyncio.Queue()
-    log_history = []
+    event_handoff.attach(asyncio.get_running_loop())
     
     token = os.getenv("TELEGRAM_BOT_TOKEN")
     
     if not token:
         print("AVISO: TELEGRAM_BOT_TOKEN não encontrado. Bot não será inicializado.")
-        return
+        return None
     
     try:
-        bot_instance = TelegramBot(token=token)
+        bot_instance = TelegramBot(
+            token=token,
+            connection_pool_size=int(os.getenv("TELEGRAM_POOL_SIZE", 64)),
+            keepalive_expiry=float(os.getenv("TELEGRAM_KEEPALIVE", 60)),
+            store_max_messages=int(os.getenv("STORE_MAX_MESSAGES", 500)),
+            store_max_age=float(os.getenv("STORE_MAX_AGE_HOURS", 168)) * 3600,
+            persistent_queue=os.getenv("PERSISTENT_QUEUE", "").lower() in ("1", "true", "yes"),
+            media_spool_size=int(float(os.getenv("MEDIA_SPOOL_MB", 8)) * 1024 * 1024),
+            media_memory_limit=int(float(os.getenv("MEDIA_MEMORY_MB", 128)) * 1024 * 1024),
+            file_id_cache_size=int(os.getenv("FILE_ID_CACHE_SIZE", 2000)),
+            persist_file_id_cache=os.getenv("PERSIST_FILE_ID_CACHE", "").lower() in ("1", "true", "yes"),
+            webhook_url=os.getenv("TELEGRAM_WEBHOOK_URL") or None,
+            webhook_secret=os.getenv("TELEGRAM_WEBHOOK_SECRET") or None,
+            dedup_ttl=float(os.getenv("DEDUP_TTL_HOURS", 168)) * 3600,
+            persist_dedup_index=os.getenv("PERSIST_DEDUP_INDEX", "1").lower() in ("1", "true", "yes"),
+            progress_max_rate=float(os.getenv("PROGRESS_MAX_RATE", 4)),
+        )
         bot_instance.set_log_callback(log_callback)
         bot_instance.set_progress_callback(progress_callback)
         
@@ -221,11 +192,18 @@ async def startup_event():
             bot_instance.set_config(persisted_config)
             print("Configuração persistida carregada com sucesso!")
         
-        # Inicializa polling em background
+        # Inicializa polling (ou registra o webhook) em background
         asyncio.create_task(bot_instance.initialize())
         print("Bot Telegram inicializado com sucesso!")
     except Exception as e:
         print(f"Erro ao inicializar bot: {e}")
+    return bot_instance
+
+
+@app.on_event("startup")
+async def startup_event():
+    """Inicializa o bot ao iniciar a aplicação"""
+    await ensure_bot_instance()
 
 
 @app.on_event("shutdown")
@@ -240,6 +218,7 @@ async def shutdown_event():
 app.include_router(config_router)
 app.include_router(control_router)
 app.include_router(logs_router)
+app.include_router(monitor_router)
 
 
 @app.get("/")
@@ -255,5 +234,8 @@ async def root():
 @app.get("/health")
 async def health():
     """Health check"""
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "dropped_events": event_handoff.dropped  # Eventos de log/progresso perdidos com o buffer cheio
+    }
 
@@ -1,6 +1,7 @@
 from .config import router as config_router
 from .control import router as control_router
 from .logs import router as logs_router
+from .monitor import router as monitor_router
 
-__all__ = ["config_router", "control_router", "logs_router"]
+__all__ = ["config_router", "control_router", "logs_router", "monitor_router"]
 
@@ -2,7 +2,7 @@ from fastapi import APIRouter, HTTPException, UploadFile, File
 from fastapi.responses import Response
 from typing import List
 from backend.models.config import Config, PostConfig, ChannelConfig, ChannelStats
-from backend.bot.config_storage import save_config as persist_config, load_config as load_persisted_config
+from backend.bot.config_storage import save_config as persist_config, load_config as load_persisted_config, migrate_legacy_templates
 import json
 from datetime import datetime
 
@@ -55,10 +55,7 @@ async def set_stock_channel(channel: ChannelConfig):
         if not bot_instance:
             raise HTTPException(status_code=500, detail="Bot não inicializado")
         
-        if not bot_instance.config:
-            bot_instance.config = Config()
-        
-        bot_instance.config.stock_channel = channel
+        bot_instance.set_stock_channel(channel)
         # Persiste em arquivo
         persist_config(bot_instance.config)
         return {"message": "Canal de estoque configurado", "channel": channel}
@@ -78,6 +75,8 @@ async def set_destination_channels(channels: list[ChannelConfig]):
             bot_instance.config = Config()
         
         bot_instance.config.destination_channels = channels
+        # Reaplica configuração (atualiza estatísticas e cache de resolução dos canais)
+        bot_instance.set_config(bot_instance.config)
         # Persiste em arquivo
         persist_config(bot_instance.config)
         return {"message": "Canais de destino configurados", "channels": channels}
@@ -93,10 +92,7 @@ async def set_post_config(post_config: PostConfig):
         if not bot_instance:
             raise HTTPException(status_code=500, detail="Bot não inicializado")
         
-        if not bot_instance.config:
-            bot_instance.config = Config()
-        
-        bot_instance.config.post_config = post_config
+        bot_instance.set_post_config(post_config)
         # Persiste em arquivo
         persist_config(bot_instance.config)
         return {"message": "Configuração de postagem salva", "config": post_config}
@@ -119,11 +115,13 @@ async def get_messages(channel_id: str, limit: int = 100):
             "messages": [
                 {
                     "message_id": msg.message_id,
-                    "has_video": bool(msg.video),
-                    "has_photo": bool(msg.photo),
-                    "has_document": bool(msg.document),
-                    "has_text": bool(msg.text or msg.caption),
-                    "date": msg.date.isoformat() if msg.date else None
+                    "media_kind": msg.media_kind,
+                    "has_video": msg.media_kind == "video",
+                    "has_photo": msg.media_kind == "photo",
+                    "has_document": msg.media_kind in ("document", "animation"),
+                    "has_text": bool(msg.text),
+                    "posted": msg.posted,
+                    "date": msg.date_iso()
                 }
                 for msg in messages
             ]
@@ -140,12 +138,7 @@ async def clear_messages(channel_id: str):
         if not bot_instance:
             raise HTTPException(status_code=500, detail="Bot não inicializado")
         
-        # Normaliza o ID do canal
-        normalized_id = bot_instance._normalize_channel_id(channel_id)
-        storage_key = str(normalized_id).lstrip('-')
-        
-        if storage_key in bot_instance._stored_messages:
-            del bot_instance._stored_messages[storage_key]
+        bot_instance.clear_channel_messages(channel_id)
         
         return {"message": f"Mensagens do canal {channel_id} foram limpas"}
     except Exception as e:
@@ -161,7 +154,7 @@ async def clear_all_messages():
             raise HTTPException(status_code=500, detail="Bot não inicializado")
         
         # Limpa todas as mensagens armazenadas
-        bot_instance._stored_messages.clear()
+        bot_instance.clear_all_messages()
         
         return {"message": "Todas as mensagens foram limpas da fila"}
     except Exception as e:
@@ -273,6 +266,7 @@ async def import_config(file: UploadFile = File(...)):
         # Cria objeto Config
         try:
             config_dict = backup_data["config"]
+            migrate_legacy_templates(config_dict)  # Backups de antes das variáveis de template
             config = Config(**config_dict)
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Erro ao validar configuração: {str(e)}")
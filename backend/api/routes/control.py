@@ -21,11 +21,20 @@ async def start_posting():
         if bot_instance.status.value == "running":
             raise HTTPException(status_code=400, detail="Postagem já está em andamento")
         
+        # Sessão parada que ainda termina envios: espera acabar (dois loops dividiriam a mesma fila)
+        previous = bot_instance._posting_task
+        if previous is not None and not previous.done():
+            await asyncio.wait({previous})
+            if bot_instance._posting_task is not previous:
+                raise HTTPException(status_code=400, detail="Postagem já está em andamento")
+        
         # Inicia postagem em background
         task = asyncio.create_task(bot_instance.start_posting())
         bot_instance._posting_task = task
         
         return {"message": "Postagem iniciada", "status": "running"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
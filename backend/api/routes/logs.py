@@ -1,17 +1,20 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Header, Query
 from fastapi.responses import StreamingResponse
 from backend.models.config import LogEntry
-import asyncio
 import json
-from typing import AsyncGenerator, List
+import os
+from typing import AsyncGenerator, List, Optional
 
 router = APIRouter(prefix="/api/logs", tags=["logs"])
 
+# Intervalo dos comentários de keep-alive quando não há eventos (segundos)
+SSE_HEARTBEAT_INTERVAL = float(os.getenv("SSE_HEARTBEAT_SECONDS", 15))
 
-def get_queues():
-    """Obtém as filas (lazy import para evitar circular)"""
-    from backend.api.main import log_queue, progress_queue
-    return log_queue, progress_queue
+
+def get_event_hub():
+    """Obtém o hub de eventos (lazy import para evitar circular)"""
+    from backend.api.main import event_hub
+    return event_hub
 
 
 def _get_log_history_data():
@@ -20,35 +23,48 @@ def _get_log_history_data():
     return log_history
 
 
-async def log_stream() -> AsyncGenerator[str, None]:
-    """Stream de logs via Server-Sent Events"""
-    log_queue, progress_queue = get_queues()
-    while True:
-        try:
-            # Verifica se há novos logs
-            while not log_queue.empty():
-                log_entry = await log_queue.get()
-                yield f"data: {log_entry.model_dump_json()}\n\n"
-            
-            # Verifica progresso
-            while not progress_queue.empty():
-                progress = await progress_queue.get()
-                yield f"data: {json.dumps({'type': 'progress', **progress})}\n\n"
-            
-            # Aguarda um pouco antes de verificar novamente
-            await asyncio.sleep(0.5)
-        except asyncio.CancelledError:
-            break
-        except Exception as e:
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
-            await asyncio.sleep(1)
+def _format_event(event) -> str:
+    """Evento SSE; logs levam o seq como id (o navegador o devolve em Last-Event-ID ao reconectar)"""
+    if isinstance(event, LogEntry):
+        return f"id: {event.seq}\ndata: {event.model_dump_json()}\n\n"
+    return f"data: {json.dumps(event)}\n\n"
+
+
+async def log_stream(since: Optional[int] = None) -> AsyncGenerator[str, None]:
+    """Stream de logs via Server-Sent Events (cada cliente tem sua própria inscrição no hub)
+
+    Dorme até chegar evento; os que chegam juntos vão numa única escrita.
+    Sem eventos, envia um comentário a cada SSE_HEARTBEAT_INTERVAL para manter a conexão.
+    """
+    hub = get_event_hub()
+    subscription = hub.subscribe(since)
+    try:
+        while True:
+            try:
+                events = await subscription.wait(SSE_HEARTBEAT_INTERVAL)
+                yield "".join(map(_format_event, events)) if events else ": keep-alive\n\n"
+            except Exception as e:
+                yield f"data: {json.dumps({'error': str(e)})}\n\n"
+    finally:
+        hub.unsubscribe(subscription)
 
 
 @router.get("/stream")
-async def stream_logs():
-    """Endpoint SSE para logs em tempo real"""
+async def stream_logs(
+    since: Optional[int] = Query(default=None, ge=0, description="Reenvia os logs do histórico com seq maior que este"),
+    last_event_id: Optional[str] = Header(default=None),
+):
+    """Endpoint SSE para logs em tempo real
+
+    Ao reconectar, o navegador envia o cabeçalho Last-Event-ID e o stream continua do log seguinte.
+    O cabeçalho tem prioridade sobre `since`: a reconexão automática repete a URL original, cujo
+    `since` é o da primeira conexão. Um seq de antes de um reinício do backend é tratado pelo hub
+    (reenvia o histórico inteiro).
+    """
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
     return StreamingResponse(
-        log_stream(),
+        log_stream(since),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -59,12 +75,16 @@ async def stream_logs():
 
 
 @router.get("/history", response_model=List[LogEntry])
-async def get_log_history():
-    """Obtém histórico de logs (últimas 1000 entradas)"""
+async def get_log_history(
+    since: Optional[int] = Query(default=None, ge=0, description="Retorna só os logs com seq maior que este"),
+    limit: Optional[int] = Query(default=None, ge=1, description="Máximo de logs retornados"),
+):
+    """Obtém histórico de logs
+
+    Com `since`, retorna os logs seguintes (do mais antigo ao mais novo); sem ele, os `limit` mais recentes.
+    """
     try:
-        log_history = _get_log_history_data()
-        # Retorna os últimos 1000 logs
-        return list(log_history)[-1000:] if log_history else []
+        return _get_log_history_data().since(since, limit)
     except Exception as e:
         return []
 
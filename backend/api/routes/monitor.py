@@ -1,40 +1,40 @@
 """
 Rotas para monitoramento de mensagens em tempo real
 """
-from fastapi import APIRouter
-from telegram import Update
-from telegram.ext import Application
+import secrets
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Request
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/monitor", tags=["monitor"])
 
-# Aplicação do bot para monitoramento
-telegram_app: Application = None
 
-
-def get_bot_instance():
-    """Obtém a instância do bot (lazy import para evitar circular)"""
-    from backend.api.main import bot_instance
-    return bot_instance
-
-
-async def process_update(update: Update):
-    """Processa update do Telegram"""
-    if telegram_app:
-        await telegram_app.process_update(update)
+async def get_bot_instance():
+    """Obtém a instância do bot, criando-a se a API rodar sem startup (ex.: Vercel com lifespan desligado)"""
+    from backend.api.main import ensure_bot_instance
+    return await ensure_bot_instance()
 
 
 @router.post("/webhook")
-async def webhook(update: dict):
+async def webhook(
+    request: Request,
+    x_telegram_bot_api_secret_token: Optional[str] = Header(default=None),
+):
     """Webhook para receber updates do Telegram"""
+    bot_instance = await get_bot_instance()
+    if not bot_instance or not bot_instance.webhook_url:
+        raise HTTPException(status_code=404, detail="Webhook não habilitado")
+
+    # O Telegram envia o secret_token registrado em set_webhook neste cabeçalho
+    if not secrets.compare_digest(x_telegram_bot_api_secret_token or "", bot_instance.webhook_secret):
+        raise HTTPException(status_code=403, detail="Secret token inválido")
+
     try:
-        if telegram_app:
-            telegram_update = Update.de_json(update, telegram_app.bot)
-            await telegram_app.process_update(telegram_update)
+        await bot_instance.process_webhook_update(await request.json())
         return {"status": "ok"}
     except Exception as e:
+        # Responde 200 mesmo assim: o Telegram reenviaria o mesmo update indefinidamente
         logger.error(f"Erro ao processar webhook: {e}")
         return {"status": "error", "message": str(e)}
-
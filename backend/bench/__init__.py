@@ -0,0 +1 @@
+# Benchmarks (não fazem parte do deploy)
@@ -0,0 +1,131 @@
+"""
+Micro-benchmark do PostProcessor: custo por mensagem antes e depois da compilação por PostConfig
+
+Uso (na raiz do repositório):
+    python -m backend.bench.post_processor [--calls 100000] [--repeat 5] [--captions 20000]
+
+Antes de medir, confere que a saída é a mesma da implementação anterior em legendas aleatórias.
+"""
+import argparse
+import html
+import random
+import re
+import string
+import timeit
+from typing import Any, Dict
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, MessageEntity
+from telegram.constants import MessageEntityType
+from backend.bot.message_store import StoredMessage
+from backend.bot.post_processor import PostProcessor
+from backend.models.config import PostConfig
+
+
+class LegacyPostProcessor:
+    """Implementação anterior (métodos estáticos: regexes, template e botão refeitos a cada mensagem)"""
+
+    @staticmethod
+    def clean_message_text(message: StoredMessage) -> str:
+        if not message.text:
+            return ""
+        text = message.text
+        if message.entities:
+            entities_to_remove = []
+            for entity in message.entities:
+                if entity.type in [MessageEntityType.TEXT_LINK, MessageEntityType.URL,
+                                   MessageEntityType.MENTION, MessageEntityType.HASHTAG]:
+                    continue
+                entities_to_remove.append(entity)
+            for entity in sorted(entities_to_remove, key=lambda x: x.offset + x.length, reverse=True):
+                if entity.type in [MessageEntityType.MENTION]:
+                    start = entity.offset
+                    end = entity.offset + entity.length
+                    if start < len(text) and end <= len(text):
+                        text = text[:start] + text[end:]
+        for pattern in [r'via @\w+', r'from @\w+', r'canal: @\w+', r'@\w+\s*$']:
+            text = re.sub(pattern, '', text, flags=re.IGNORECASE)
+        return re.sub(r'\s+', ' ', text).strip()
+
+    @staticmethod
+    def apply_template(original_text: str, config: PostConfig) -> str:
+        if config.template_text:
+            if original_text:
+                return f"{config.template_text}\n\n{original_text}"
+            return config.template_text
+        return original_text
+
+    @staticmethod
+    def get_button_markup(config: PostConfig):
+        if config.button_label and config.button_url:
+            return InlineKeyboardMarkup([[InlineKeyboardButton(text=config.button_label, url=config.button_url)]])
+        return None
+
+    @staticmethod
+    def process_message(message: StoredMessage, config: PostConfig) -> Dict[str, Any]:
+        final_text = LegacyPostProcessor.apply_template(LegacyPostProcessor.clean_message_text(message), config)
+        return {
+            'message': message,
+            'text': final_text if final_text else None,
+            'caption': final_text if message.has_media else None,
+            'reply_markup': LegacyPostProcessor.get_button_markup(config),
+            'has_media': message.has_media,
+        }
+
+
+def random_caption(rng: random.Random) -> StoredMessage:
+    """Legenda com palavras, menções (com entities), assinaturas e espaços variados"""
+    words, entities, text = [], [], ""
+    for _ in range(rng.randint(0, 25)):
+        kind = rng.random()
+        if kind < 0.15:
+            word = "@" + "".join(rng.choices(string.ascii_letters + "_", k=rng.randint(3, 12)))
+            entities.append(MessageEntity(MessageEntityType.MENTION, len(text), len(word)))
+        elif kind < 0.2:
+            word = rng.choice(["via", "from", "Canal:", "VIA"]) + " @" + "".join(rng.choices(string.ascii_lowercase, k=6))
+        else:
+            word = "".join(rng.choices(string.ascii_letters + string.digits + "áéíõç!?.,#", k=rng.randint(1, 10)))
+        words.append(word)
+        text += word + rng.choice([" ", "  ", "\n", "\t "])
+    return StoredMessage(1, 1, "video", file_id="f", file_unique_id="u", text=text or None, entities=tuple(entities))
+
+
+def check_equivalence(config: PostConfig, captions: int, seed: int = 12345) -> None:
+    """Texto final igual ao da implementação anterior (o texto original agora vai escapado para HTML)"""
+    rng = random.Random(seed)
+    processor = PostProcessor(config)
+    for _ in range(captions):
+        message = random_caption(rng)
+        legacy_clean = LegacyPostProcessor.clean_message_text(message)
+        expected = LegacyPostProcessor.apply_template(html.escape(legacy_clean, quote=False), config)
+        actual = processor.process_message(message)['caption']
+        if (actual or "") != expected:
+            raise AssertionError(f"Saída diferente para {message.text!r}: {actual!r} != {expected!r}")
+    print(f"Saída idêntica em {captions} legendas aleatórias")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=100_000, help="chamadas por rodada")
+    parser.add_argument("--repeat", type=int, default=5, help="rodadas (vale a melhor)")
+    parser.add_argument("--captions", type=int, default=20_000, help="legendas da conferência de saída")
+    args = parser.parse_args()
+
+    config = PostConfig(template_text="🔥 <b>Novidade</b>", button_label="Saiba mais", button_url="https://example.com")
+    check_equivalence(config, args.captions)
+
+    # Vídeo com legenda, template e botão
+    message = StoredMessage(
+        1, 1, "video", file_id="f", file_unique_id="u",
+        text="Confira o novo vídeo completo no canal  via @estoque_videos\n\n@estoque_videos",
+    )
+    processor = PostProcessor(config)
+    cases = (
+        ("antes", lambda: LegacyPostProcessor.process_message(message, config)),
+        ("depois", lambda: processor.process_message(message)),
+    )
+    for label, call in cases:
+        best = min(timeit.repeat(call, number=args.calls, repeat=args.repeat))
+        print(f"{label:>7}: {best / args.calls * 1e6:6.2f} us/mensagem")
+
+
+if __name__ == "__main__":
+    main()
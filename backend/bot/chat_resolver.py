@@ -0,0 +1,57 @@
+"""
+Cache persistente de resolução dos canais de destino (channel_id configurado -> chat.id numérico)
+"""
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+from backend.bot.config_storage import state_path
+from backend.bot.persisted_map import PersistedMap
+
+logger = logging.getLogger(__name__)
+
+
+class ChatResolverCache:
+    """Mapeia cada ChannelConfig.channel_id para o ID numérico e título resolvidos pela API"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path or state_path("chat_cache.json")
+        self._entries: Dict[str, Dict] = {}
+        self._store = PersistedMap(self.path, "cache de canais", lambda: self._entries, indent=2, ensure_ascii=False)
+        self.load()
+
+    def get(self, channel_id: str) -> Optional[Dict]:
+        """Retorna {'chat_id': int, 'title': str} ou None se não resolvido"""
+        return self._entries.get(channel_id)
+
+    def set(self, channel_id: str, chat_id: int, title: Optional[str]):
+        """Registra resolução bem-sucedida e persiste se mudou"""
+        entry = {"chat_id": chat_id, "title": title}
+        if self._entries.get(channel_id) == entry:
+            return
+        self._entries[channel_id] = entry
+        self.save()
+
+    def invalidate(self, channel_id: str):
+        """Remove resolução (ex.: após ChatNotFound/Forbidden)"""
+        if self._entries.pop(channel_id, None) is not None:
+            self.save()
+
+    def retain(self, channel_ids: Iterable[str]):
+        """Mantém apenas os canais ainda configurados"""
+        keep = set(channel_ids)
+        removed = [cid for cid in self._entries if cid not in keep]
+        for cid in removed:
+            del self._entries[cid]
+        if removed:
+            self.save()
+
+    def load(self):
+        """Carrega cache do disco"""
+        self._entries = self._store.load(lambda data: {
+            str(cid): {"chat_id": int(e["chat_id"]), "title": e.get("title")}
+            for cid, e in data.items()
+        }) or {}
+
+    def save(self) -> bool:
+        """Salva cache em disco"""
+        return self._store.save()
@@ -3,8 +3,9 @@ Sistema de persistência de configurações usando arquivo JSON
 """
 import json
 import logging
+import os
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional
 from backend.models.config import Config
 
 logger = logging.getLogger(__name__)
@@ -24,20 +25,32 @@ def get_config_path() -> Path:
     return config_path.resolve()
 
 
+def state_path(filename: str) -> Path:
+    """Caminho de um arquivo de estado do bot (caches, índice, fila), ao lado do config.json"""
+    return get_config_path().parent / filename
+
+
+def write_json_atomic(path: Path, data: Any, **dump_kwargs):
+    """Grava JSON em arquivo temporário e troca pelo destino (uma queda não deixa o arquivo pela metade)"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, **dump_kwargs)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
 def save_config(config: Config) -> bool:
     """Salva configuração em arquivo JSON"""
     try:
         config_path = get_config_path()
         
-        # Cria diretório se não existir
-        config_path.parent.mkdir(parents=True, exist_ok=True)
-        
         # Converte para dict, excluindo status (não deve ser persistido)
         config_dict = config.model_dump(exclude={'status'})
         
         # Salva em JSON
-        with open(config_path, 'w', encoding='utf-8') as f:
-            json.dump(config_dict, f, indent=2, ensure_ascii=False)
+        write_json_atomic(config_path, config_dict, indent=2, ensure_ascii=False)
         
         logger.info(f"Configuração salva em {config_path}")
         return True
@@ -46,6 +59,26 @@ def save_config(config: Config) -> bool:
         return False
 
 
+def migrate_legacy_templates(config_dict: dict) -> int:
+    """Escapa chaves de templates salvos antes das variáveis ({PROMO} vira texto literal)
+
+    Templates válidos não são alterados. Retorna quantos templates foram migrados.
+    """
+    from backend.bot.template import TemplateError, compile_template, escape_unknown_placeholders
+    post_configs = [config_dict.get("post_config")]
+    post_configs += [route.get("post_config") for route in config_dict.get("stock_routes") or () if isinstance(route, dict)]
+    migrated = 0
+    for post_config in post_configs:
+        if not isinstance(post_config, dict) or not isinstance(post_config.get("template_text"), str):
+            continue
+        try:
+            compile_template(post_config["template_text"])
+        except TemplateError:
+            post_config["template_text"] = escape_unknown_placeholders(post_config["template_text"])
+            migrated += 1
+    return migrated
+
+
 def load_config() -> Optional[Config]:
     """Carrega configuração do arquivo JSON"""
     try:
@@ -59,6 +92,10 @@ def load_config() -> Optional[Config]:
         with open(config_path, 'r', encoding='utf-8') as f:
             config_dict = json.load(f)
         
+        # Templates antigos: chaves desconhecidas viram texto (não derruba a configuração toda)
+        if migrate_legacy_templates(config_dict):
+            logger.warning("Template com chaves desconhecidas migrado: as chaves serão postadas como texto")
+        
         # Cria objeto Config
         config = Config(**config_dict)
         logger.info(f"Configuração carregada de {config_path}")
@@ -0,0 +1,90 @@
+"""
+Índice de deduplicação por conteúdo: mesma mídia + mesma legenda não é repostada dentro do TTL
+"""
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, Optional
+from backend.bot.config_storage import state_path
+from backend.bot.persisted_map import PersistedMap
+from backend.bot.message_store import StoredMessage
+
+logger = logging.getLogger(__name__)
+
+
+def content_key(storage_key: str, record: StoredMessage) -> Optional[str]:
+    """Chave de conteúdo: canal de estoque + file_unique_id + hash da legenda normalizada
+
+    A legenda é comparada sem diferença de maiúsculas e espaços. Só mídias são
+    deduplicadas: mensagens de texto (sem file_unique_id) retornam None, já que um
+    mesmo texto pode ser repostado de propósito.
+    """
+    if not record.file_unique_id:
+        return None
+    caption = ' '.join((record.text or '').casefold().split())
+    caption_hash = hashlib.blake2b(caption.encode(), digest_size=8).hexdigest() if caption else ""
+    return f"{storage_key}|{record.file_unique_id}|{caption_hash}"
+
+
+class DedupIndex:
+    """Chaves de conteúdo vistas recentemente, em ordem de chegada, com persistência opcional
+
+    `seen` é uma busca em dict; as entradas expiradas saem do início da ordem.
+    Gravações em disco são agrupadas: no máximo uma a cada `save_interval` segundos
+    (e uma final em `flush`, no desligamento).
+    """
+
+    def __init__(self, ttl: Optional[float] = 7 * 24 * 3600, path: Optional[Path] = None, persist: bool = False,
+                 save_interval: float = 5.0):
+        self.ttl = ttl  # Em segundos (None ou 0 = deduplicação desligada)
+        self.path = path or state_path("dedup_index.json")
+        self.persist = persist
+        self.duplicates = 0  # Duplicatas rejeitadas desde que o bot iniciou
+        self._entries: "OrderedDict[str, float]" = OrderedDict()  # chave -> timestamp de chegada
+        self._store = PersistedMap(self.path, "índice de deduplicação", lambda: self._entries, save_interval)
+        if persist and ttl:
+            self.load()
+
+    def seen(self, key: Optional[str], now: Optional[float] = None) -> bool:
+        """Registra a chave; retorna True (e conta a duplicata) se ela já foi vista dentro do TTL"""
+        if not key or not self.ttl:
+            return False
+        now = time.time() if now is None else now
+        self._expire(now)
+        if key in self._entries:
+            self.duplicates += 1
+            return True
+        self._entries[key] = now
+        if self.persist:
+            self._store.changed()
+        return False
+
+    def discard(self, keys: Iterable[Optional[str]]):
+        """Esquece chaves de mensagens descartadas sem postar (o mesmo conteúdo volta a ser aceito)"""
+        removed = False
+        for key in keys:
+            if key and self._entries.pop(key, None) is not None:
+                removed = True
+        if removed and self.persist:
+            self._store.changed()
+
+    def flush(self):
+        """Grava as entradas pendentes agora (cancela a gravação adiada)"""
+        self._store.flush()
+
+    def _expire(self, now: float):
+        cutoff = now - self.ttl
+        while self._entries:
+            key, seen_at = next(iter(self._entries.items()))
+            if seen_at >= cutoff:
+                break
+            self._entries.popitem(last=False)
+
+    def load(self):
+        """Carrega índice do disco (entradas expiradas são descartadas)"""
+        self._entries = self._store.load(lambda data: OrderedDict(
+            sorted(((str(k), float(v)) for k, v in data.items()), key=lambda item: item[1])
+        )) or OrderedDict()
+        self._expire(time.time())
@@ -0,0 +1,94 @@
+"""
+Cache de file_id: file_unique_id da mídia original -> file_id do arquivo já enviado por este bot
+"""
+import asyncio
+import logging
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+from telegram import Message
+from backend.bot.config_storage import state_path
+from backend.bot.persisted_map import PersistedMap
+
+logger = logging.getLogger(__name__)
+
+
+def sent_file_id(message: Message) -> Optional[str]:
+    """file_id da mídia de uma mensagem enviada pelo bot"""
+    media = message.video or message.animation or message.document or (message.photo[-1] if message.photo else None)
+    return media.file_id if media else None
+
+
+class FileIdCache:
+    """LRU em memória, com persistência opcional em disco
+
+    Depois do primeiro upload de uma mídia, os demais destinos (e reposts do mesmo
+    conteúdo) usam o file_id retornado, sem reenviar os bytes. Gravações em disco são
+    agrupadas: no máximo uma a cada `save_interval` segundos (e uma final em `flush`).
+    """
+
+    def __init__(self, max_entries: int = 2000, path: Optional[Path] = None, persist: bool = False,
+                 save_interval: float = 5.0):
+        self.max_entries = max_entries
+        self.path = path or state_path("file_id_cache.json")
+        self.persist = persist
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._claims: Dict[str, List] = {}  # file_unique_id -> [lock, usuários]
+        self._store = PersistedMap(self.path, "cache de file_id", lambda: self._entries, save_interval)
+        if persist:
+            self.load()
+
+    def get(self, unique_id: Optional[str]) -> Optional[str]:
+        if not unique_id:
+            return None
+        file_id = self._entries.get(unique_id)
+        if file_id is not None:
+            self._entries.move_to_end(unique_id)
+        return file_id
+
+    def set(self, unique_id: Optional[str], file_id: Optional[str]):
+        if not unique_id or not file_id or self._entries.get(unique_id) == file_id:
+            return
+        self._entries[unique_id] = file_id
+        self._entries.move_to_end(unique_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        if self.persist:
+            self._store.changed()
+
+    def invalidate(self, unique_id: Optional[str]):
+        """Remove file_id recusado pela API"""
+        if unique_id and self._entries.pop(unique_id, None) is not None and self.persist:
+            self._store.changed()
+
+    @asynccontextmanager
+    async def claim(self, unique_id: Optional[str]) -> AsyncIterator[Optional[str]]:
+        """Serializa o primeiro upload de uma mídia; fornece o file_id em cache (ou None)
+
+        Destinos concorrentes aguardam quem está enviando e, ao entrar, já encontram o file_id.
+        """
+        if not unique_id:
+            yield None
+            return
+        claim = self._claims.setdefault(unique_id, [asyncio.Lock(), 0])
+        claim[1] += 1
+        try:
+            async with claim[0]:
+                yield self.get(unique_id)
+        finally:
+            claim[1] -= 1
+            if claim[1] == 0:
+                del self._claims[unique_id]
+
+    def load(self):
+        """Carrega cache do disco"""
+        self._entries = self._store.load(
+            lambda data: OrderedDict((str(k), str(v)) for k, v in data.items())
+        ) or OrderedDict()
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def flush(self):
+        """Grava as mudanças pendentes agora (ordem preservada: menos usados primeiro)"""
+        self._store.flush()
@@ -0,0 +1,125 @@
+"""
+Relay de mídia para o fallback de download/reenvio: cada arquivo é baixado uma única vez
+(para um arquivo temporário) e compartilhado entre todos os destinos
+"""
+import asyncio
+import logging
+import tempfile
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+from telegram import Bot, InputFile
+from backend.bot.message_store import StoredMessage
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBudget:
+    """Limita quantos bytes de mídia podem estar em memória ao mesmo tempo
+
+    Um arquivo maior que o limite ainda é aceito, mas apenas quando nada mais está em uso.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_use = 0
+        self._condition = asyncio.Condition()
+
+    @asynccontextmanager
+    async def reserve(self, size: int) -> AsyncIterator[None]:
+        size = min(size, self.limit)
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_use + size <= self.limit)
+            self.in_use += size
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.in_use -= size
+                self._condition.notify_all()
+
+
+class _RelayEntry:
+    __slots__ = ("lock", "file", "size", "users", "released")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.file: Optional[tempfile.SpooledTemporaryFile] = None
+        self.size = 0
+        self.users = 0  # open() em andamento
+        self.released = False  # Fecha o arquivo quando o último usuário sair
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+class MediaRelay:
+    """Baixa a mídia de uma mensagem uma vez e a entrega a cada destino a partir dessa cópia
+
+    O download usa o cliente HTTP do próprio bot (pool compartilhado; a URL com o token
+    não aparece nas mensagens de erro). O PTB recebe o arquivo inteiro em memória antes de
+    copiá-lo para um SpooledTemporaryFile (em memória até `spool_size` bytes, depois em
+    disco), por isso o download também reserva o tamanho do arquivo no `MemoryBudget`.
+    Cada upload lê a cópia sob o mesmo orçamento, então o pico de memória de downloads e
+    reenvios concorrentes fica limitado a `memory_limit` bytes.
+    A cópia é descartada com `release()` assim que o primeiro upload dá certo (os demais
+    destinos usam o file_id em cache) ou, no máximo, ao fim do fan-out da mensagem.
+    """
+
+    def __init__(self, bot: Bot, spool_size: int = 8 * 1024 * 1024, memory_limit: int = 128 * 1024 * 1024):
+        self.bot = bot
+        self.spool_size = spool_size
+        self.budget = MemoryBudget(memory_limit)
+        self._entries: Dict[str, _RelayEntry] = {}
+
+    @staticmethod
+    def _key(message: StoredMessage) -> str:
+        return message.file_unique_id or message.file_id
+
+    async def _download(self, message: StoredMessage, entry: _RelayEntry):
+        """Baixa o arquivo pelo request do bot (também lê file_path local do servidor Bot API local)"""
+        tg_file = await self.bot.get_file(message.file_id)
+        spool = tempfile.SpooledTemporaryFile(max_size=self.spool_size)
+        try:
+            # Tamanho desconhecido: reserva o orçamento inteiro (download sozinho)
+            async with self.budget.reserve(tg_file.file_size or self.budget.limit):
+                await tg_file.download_to_memory(out=spool, read_timeout=120)
+        except BaseException:
+            spool.close()
+            raise
+        entry.size = spool.tell()
+        entry.file = spool
+
+    @asynccontextmanager
+    async def open(self, message: StoredMessage) -> AsyncIterator[InputFile]:
+        """Fornece a mídia pronta para upload (baixa na primeira chamada para esta mensagem)"""
+        key = self._key(message)
+        entry = self._entries.setdefault(key, _RelayEntry())
+        entry.users += 1
+        try:
+            async with entry.lock:
+                if entry.file is None:
+                    await self._download(message, entry)
+            async with self.budget.reserve(entry.size):
+                # seek + read sem await no meio: seguro entre destinos concorrentes
+                entry.file.seek(0)
+                yield InputFile(entry.file.read(), filename=message.file_name)
+        finally:
+            entry.users -= 1
+            if entry.released and entry.users == 0:
+                entry.close()
+
+    def release(self, message: StoredMessage):
+        """Descarta a cópia local da mídia (usuários em andamento terminam antes do fechamento)"""
+        if not message.file_id:
+            return
+        entry = self._entries.pop(self._key(message), None)
+        if entry is not None:
+            entry.released = True
+            if entry.users == 0:
+                entry.close()
+
+    async def close(self):
+        for entry in self._entries.values():
+            entry.close()
+        self._entries.clear()
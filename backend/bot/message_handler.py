@@ -3,7 +3,7 @@ Handler para monitorar mensagens do canal de estoque em tempo real
 """
 import logging
 from typing import TYPE_CHECKING
-from telegram import Update, Message
+from telegram import Update
 from telegram.ext import Application, MessageHandler, filters, ContextTypes
 
 if TYPE_CHECKING:
@@ -19,73 +19,30 @@ async def handle_channel_message(update: Update, context: ContextTypes.DEFAULT_T
     if not message:
         return
     
+    # Obtém instância do bot do contexto
+    bot_instance = context.bot_data.get('bot_instance')
+    if not bot_instance:
+        return
+    
+    # Caminho rápido: descarta qualquer chat que não seja um canal de estoque antes de logar
+    # (a tabela de roteamento é montada quando a configuração muda)
     chat = message.chat
+    route = bot_instance.routing.match(chat.id, chat.username)
+    if route is None:
+        return
     
     # Verifica se é um canal ou supergrupo
     if chat.type not in ['channel', 'supergroup']:
         return
     
-    # Log para debug
-    logger.info(f"Mensagem recebida do chat: {chat.type} - ID: {chat.id} - Username: {chat.username}")
-    
-    # Obtém instância do bot do contexto
-    bot_instance = context.bot_data.get('bot_instance')
-    
-    if not bot_instance:
+    # Armazena a mensagem na chave da rota (a mesma usada pelo loop de postagem)
+    if not bot_instance.store_message(route.stock_channel.channel_id, message):
+        logger.debug(f"Mensagem do canal de estoque não armazenada: {message.message_id} (Chat ID: {chat.id})")
         return
-    
-    # Verifica se é o canal de estoque configurado
-    if bot_instance.config and bot_instance.config.stock_channel:
-        config_channel_id = bot_instance.config.stock_channel.channel_id
-        chat_username = chat.username or None
-        chat_id_str = str(chat.id)
-        
-        # Normaliza o ID configurado
-        normalized_config_id = bot_instance._normalize_channel_id(config_channel_id)
-        
-        # Compara IDs do canal (username, ID numérico, ou string)
-        matches = False
-        
-        # Tenta diferentes formas de comparação
-        if isinstance(normalized_config_id, int):
-            # Compara IDs numéricos diretamente
-            matches = normalized_config_id == chat.id
-            # Também tenta comparar com string do ID
-            if not matches:
-                matches = str(normalized_config_id) == chat_id_str or str(normalized_config_id) == str(chat.id)
-        else:
-            # Compara strings (username ou ID string)
-            config_id_clean = str(normalized_config_id).lstrip('@').strip()
-            
-            # Tenta comparar com ID numérico do chat
-            try:
-                config_id_int = int(config_id_clean.lstrip('-'))
-                # Se o ID configurado for negativo, tenta formatos alternativos
-                if config_id_clean.startswith('-'):
-                    # Compara com ID negativo
-                    matches = config_id_int == chat.id or -config_id_int == chat.id
-                else:
-                    # Compara com ID positivo
-                    matches = config_id_int == chat.id
-            except ValueError:
-                pass
-            
-            # Compara com username ou string
-            if not matches:
-                matches = (
-                    config_id_clean == chat_username or 
-                    config_id_clean == chat_id_str or
-                    config_id_clean == str(chat.id) or
-                    config_id_clean.lstrip('-') == str(abs(chat.id))
-                )
-        
-        if matches:
-            # Armazena a mensagem usando o ID do chat
-            bot_instance.store_message(chat_id_str, message)
-            logger.info(f"Mensagem armazenada do canal de estoque: {message.message_id} (Chat ID: {chat.id})")
-            # Log informativo apenas para mensagens válidas
-            if message.video or message.photo or message.document or message.text:
-                bot_instance._log(f"📥 Nova mensagem recebida do canal de estoque (ID: {message.message_id})", "info")
+    logger.info(f"Mensagem armazenada do canal de estoque: {message.message_id} (Chat ID: {chat.id})")
+    # Log informativo apenas para mensagens válidas
+    if message.video or message.photo or message.document or message.text:
+        bot_instance._log(f"📥 Nova mensagem recebida do canal de estoque (ID: {message.message_id})", "info")
 
 
 def setup_message_handler(application: Application, bot_instance):
@@ -0,0 +1,213 @@
+"""
+Armazenamento em memória das mensagens recebidas do canal de estoque (limitado e indexado)
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+from telegram import Message, MessageEntity
+
+logger = logging.getLogger(__name__)
+
+# Tipos de mídia que o sistema sabe repostar
+POSTABLE_KINDS = ("video", "animation", "photo", "document", "text")
+
+
+class StoredMessage:
+    """Registro compacto de uma mensagem do canal de estoque (sem manter o objeto Message do PTB)"""
+
+    __slots__ = (
+        "chat_id",
+        "message_id",
+        "media_kind",
+        "file_id",
+        "file_unique_id",
+        "file_name",
+        "text",
+        "entities",
+        "date",
+        "media_group_id",
+        "posted",
+    )
+
+    def __init__(
+        self,
+        chat_id: int,
+        message_id: int,
+        media_kind: str,
+        file_id: Optional[str] = None,
+        file_unique_id: Optional[str] = None,
+        file_name: Optional[str] = None,
+        text: Optional[str] = None,
+        entities: Tuple[MessageEntity, ...] = (),
+        date: Optional[float] = None,
+        media_group_id: Optional[str] = None,
+    ):
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.media_kind = media_kind  # video, animation, photo, document, text ou other
+        self.file_id = file_id
+        self.file_unique_id = file_unique_id
+        self.file_name = file_name
+        self.text = text  # Texto da mensagem ou legenda da mídia
+        self.entities = entities  # Entities do texto ou da legenda
+        self.date = date if date is not None else time.time()  # Timestamp UNIX
+        self.media_group_id = media_group_id  # Álbum ao qual a mensagem pertence
+        self.posted = False
+
+    @classmethod
+    def from_message(cls, message: Message) -> "StoredMessage":
+        """Extrai apenas o necessário para repostar a mensagem"""
+        media = None
+        # animation vem antes de document: o Telegram preenche os dois para GIFs
+        if message.video:
+            kind, media = "video", message.video
+        elif message.animation:
+            kind, media = "animation", message.animation
+        elif message.photo:
+            kind, media = "photo", message.photo[-1]  # Maior resolução
+        elif message.document:
+            kind, media = "document", message.document
+        elif message.text:
+            kind = "text"
+        else:
+            kind = "other"
+
+        return cls(
+            chat_id=message.chat_id,
+            message_id=message.message_id,
+            media_kind=kind,
+            file_id=media.file_id if media else None,
+            file_unique_id=media.file_unique_id if media else None,
+            file_name=getattr(media, "file_name", None),
+            text=message.text or message.caption,
+            entities=tuple(message.entities or message.caption_entities or ()),
+            date=message.date.timestamp() if message.date else None,
+            media_group_id=message.media_group_id,
+        )
+
+    @property
+    def has_media(self) -> bool:
+        return self.media_kind not in ("text", "other")
+
+    @property
+    def is_postable(self) -> bool:
+        return self.media_kind in POSTABLE_KINDS
+
+    def date_iso(self) -> str:
+        return datetime.fromtimestamp(self.date, tz=timezone.utc).isoformat()
+
+
+class MessageStore:
+    """Mensagens por canal, indexadas por message_id, com retenção por quantidade e idade
+
+    Mensagens postadas são marcadas e removidas primeiro quando o limite é atingido;
+    postadas mais antigas que `max_age` também saem (as pendentes esperam a postagem). `on_discard` recebe
+    (chave, registros) das mensagens removidas sem terem sido postadas (chamado com o lock).
+    """
+
+    def __init__(self, max_messages: int = 500, max_age: Optional[float] = 7 * 24 * 3600,
+                 on_discard: Optional[Callable[[str, List[StoredMessage]], None]] = None):
+        self.max_messages = max_messages  # Por canal
+        self.max_age = max_age  # Em segundos, só para postadas (None = sem limite de idade)
+        self.on_discard = on_discard
+        self._channels: Dict[str, "OrderedDict[int, StoredMessage]"] = {}
+        # Protegido por lock: seguro mesmo quando usado fora do loop da API
+        self._lock = threading.Lock()
+
+    def add(self, key: str, record: StoredMessage) -> bool:
+        """Adiciona registro; retorna False se o message_id já estava armazenado"""
+        with self._lock:
+            channel = self._channels.setdefault(key, OrderedDict())
+            if record.message_id in channel:
+                return False
+            channel[record.message_id] = record
+            self._evict(channel, key)
+            return True
+
+    def get(self, key: str, message_id: int) -> Optional[StoredMessage]:
+        channel = self._channels.get(key)
+        return channel.get(message_id) if channel else None
+
+    def list(self, key: str, limit: int = 100) -> List[StoredMessage]:
+        """Últimas `limit` mensagens do canal, em ordem de chegada"""
+        with self._lock:
+            channel = self._channels.get(key)
+            if not channel:
+                return []
+            records = list(channel.values())
+        return records[-limit:] if limit else records
+
+    def pending(self, key: str) -> List[StoredMessage]:
+        """Mensagens ainda não postadas, em ordem de chegada"""
+        with self._lock:
+            channel = self._channels.get(key)
+            if not channel:
+                return []
+            return [r for r in channel.values() if not r.posted]
+
+    def mark_posted(self, key: str, message_id: int):
+        """Marca como postada e libera espaço (postadas são as primeiras a sair)"""
+        with self._lock:
+            channel = self._channels.get(key)
+            record = channel.get(message_id) if channel else None
+            if record is None:
+                return
+            record.posted = True
+            self._evict(channel, key)
+
+    def count(self, key: Optional[str] = None) -> int:
+        if key is not None:
+            return len(self._channels.get(key, ()))
+        return sum(len(channel) for channel in self._channels.values())
+
+    def clear(self, key: Optional[str] = None) -> int:
+        """Remove mensagens de um canal (ou de todos); retorna quantas foram removidas"""
+        with self._lock:
+            if key is None:
+                count = self.count()
+                channels, self._channels = self._channels, {}
+            else:
+                channel = self._channels.pop(key, None)
+                count = len(channel) if channel else 0
+                channels = {key: channel} if channel else {}
+            for channel_key, channel in channels.items():
+                self._discarded(channel_key, [r for r in channel.values() if not r.posted])
+            return count
+
+    def _discarded(self, key: str, records: List[StoredMessage]):
+        if records and self.on_discard:
+            self.on_discard(key, records)
+
+    def _evict(self, channel: "OrderedDict[int, StoredMessage]", key: str):
+        # Idade: a ordem de chegada acompanha a data, então basta olhar o início (pendentes ficam)
+        if self.max_age is not None:
+            cutoff = time.time() - self.max_age
+            expired = []
+            for message_id, record in channel.items():
+                if record.date >= cutoff:
+                    break
+                if record.posted:
+                    expired.append(message_id)
+            for message_id in expired:
+                del channel[message_id]
+
+        overflow = len(channel) - self.max_messages
+        if overflow <= 0:
+            return
+        # Quantidade: descarta primeiro as já postadas, depois as mais antigas
+        for message_id in [mid for mid, r in channel.items() if r.posted][:overflow]:
+            del channel[message_id]
+            overflow -= 1
+        if overflow > 0:
+            logger.warning(
+                f"Armazenamento do canal {key} cheio ({self.max_messages}): "
+                f"{overflow} mensagem(ns) ainda não postada(s) descartada(s) (as mais antigas)"
+            )
+        dropped = []
+        while overflow > 0:
+            dropped.append(channel.popitem(last=False)[1])
+            overflow -= 1
+        self._discarded(key, dropped)
@@ -0,0 +1,71 @@
+"""
+Persistência em JSON dos caches em memória (carga tolerante a erro, gravação atômica e adiada)
+"""
+import asyncio
+import json
+import logging
+from pathlib import Path
+from typing import Any, Callable, Optional, TypeVar
+from backend.bot.config_storage import write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class PersistedMap:
+    """Arquivo JSON de um cache em memória: carga tolerante a erro e gravação atômica
+
+    `snapshot` devolve o que deve ser gravado. Com `save_interval`, `changed` agrupa as
+    gravações (no máximo uma por intervalo; `flush` grava o que faltar, no desligamento).
+    """
+
+    def __init__(self, path: Path, label: str, snapshot: Callable[[], Any], save_interval: float = 0, **dump_kwargs):
+        self.path = path
+        self.label = label  # Nome usado nos logs de erro
+        self.snapshot = snapshot
+        self.save_interval = save_interval
+        self.dump_kwargs = dump_kwargs
+        self._dirty = False  # Há mudanças ainda não gravadas
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def load(self, parse: Callable[[dict], T]) -> Optional[T]:
+        """Lê o arquivo e converte com `parse` (None se não existir ou estiver inválido)"""
+        try:
+            if not self.path.exists():
+                return None
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return parse(json.load(f))
+        except Exception as e:
+            logger.error(f"Erro ao carregar {self.label}: {e}")
+            return None
+
+    def save(self) -> bool:
+        try:
+            write_json_atomic(self.path, self.snapshot(), **self.dump_kwargs)
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao salvar {self.label}: {e}")
+            return False
+
+    def changed(self):
+        """Registra uma mudança: grava agora ou, com `save_interval`, ao fim do intervalo"""
+        self._dirty = True
+        if self.save_interval <= 0:
+            self.flush()
+            return
+        if self._timer is not None:
+            return
+        try:
+            self._timer = asyncio.get_running_loop().call_later(self.save_interval, self.flush)
+        except RuntimeError:
+            self.flush()  # Sem loop: não há como adiar
+
+    def flush(self):
+        """Grava as mudanças pendentes agora (cancela a gravação adiada)"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._dirty:
+            self._dirty = False
+            self.save()
@@ -1,70 +1,47 @@
+import html
 import re
-from typing import Optional, Dict, Any
-from telegram import Message
-from telegram.constants import MessageEntityType
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Pattern, Tuple
+from zoneinfo import ZoneInfo
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 from backend.models.config import PostConfig
+from backend.bot.message_store import StoredMessage
+from backend.bot.template import MEDIA_TYPE_LABELS, compile_template
+
+# Padrões comuns de assinatura de canal (aplicados em ordem)
+SIGNATURE_PATTERNS = (
+    r'via @\w+',
+    r'from @\w+',
+    r'canal: @\w+',
+    r'@\w+\s*$',
+)
+_SIGNATURE_REGEXES = tuple(re.compile(p, re.IGNORECASE) for p in SIGNATURE_PATTERNS)
+
+
+def compile_strip_patterns(patterns: List[str]) -> Tuple[Pattern, ...]:
+    """Compila padrões extras de remoção (levanta re.error se algum for inválido)"""
+    return tuple(re.compile(p, re.IGNORECASE) for p in patterns if p)
 
 
 class PostProcessor:
-    """Processa posts do Telegram removendo metadados e aplicando template"""
+    """Processa posts do Telegram removendo metadados e aplicando template
 
-    @staticmethod
-    def clean_message_text(message: Message) -> str:
-        """Remove autor e nome do canal do texto da mensagem"""
-        if not message.text and not message.caption:
-            return ""
-        
-        text = message.text or message.caption or ""
-        
-        # Remove entities que podem conter informações do autor/canal
-        if message.entities or message.caption_entities:
-            entities = message.entities or message.caption_entities or []
-            # Ordena entities por offset reverso para remover do final para o início
-            entities_to_remove = []
-            for entity in entities:
-                if entity.type in [MessageEntityType.TEXT_LINK, MessageEntityType.URL, 
-                                   MessageEntityType.MENTION, MessageEntityType.HASHTAG]:
-                    continue
-                entities_to_remove.append(entity)
-            
-            # Remove texto das entities problemáticas
-            for entity in sorted(entities_to_remove, key=lambda x: x.offset + x.length, reverse=True):
-                if entity.type in [MessageEntityType.MENTION]:
-                    start = entity.offset
-                    end = entity.offset + entity.length
-                    if start < len(text) and end <= len(text):
-                        text = text[:start] + text[end:]
-        
-        # Remove padrões comuns de assinatura de canal
-        patterns = [
-            r'via @\w+',
-            r'from @\w+',
-            r'canal: @\w+',
-            r'@\w+\s*$',
-        ]
-        
-        for pattern in patterns:
-            text = re.sub(pattern, '', text, flags=re.IGNORECASE)
-        
-        # Remove espaços extras
-        text = re.sub(r'\s+', ' ', text).strip()
-        
-        return text
+    Construído uma vez por PostConfig: regexes compiladas, template compilado e
+    markup do botão são preparados aqui e reutilizados em todas as mensagens.
+    """
 
-    @staticmethod
-    def apply_template(original_text: str, config: PostConfig) -> str:
-        """Aplica o template de postagem ao texto"""
-        if config.template_text:
-            if original_text:
-                return f"{config.template_text}\n\n{original_text}"
-            return config.template_text
-        return original_text
+    def __init__(self, config: PostConfig):
+        self.config = config
+        self._regexes = _SIGNATURE_REGEXES + compile_strip_patterns(config.strip_patterns)
+        self.template = compile_template(config.template_text)
+        self._tz = ZoneInfo(config.timezone)  # Fuso da variável {date}
+        # InlineKeyboardMarkup é imutável: a mesma instância serve para todas as mensagens
+        self._reply_markup = self._build_button_markup(config)
 
     @staticmethod
-    def get_button_markup(config: PostConfig):
+    def _build_button_markup(config: PostConfig) -> Optional[InlineKeyboardMarkup]:
         """Cria markup do botão inline se configurado"""
         if config.button_label and config.button_url:
-            from telegram import InlineKeyboardButton, InlineKeyboardMarkup
             button = InlineKeyboardButton(
                 text=config.button_label,
                 url=config.button_url
@@ -72,26 +49,92 @@ class PostProcessor:
             return InlineKeyboardMarkup([[button]])
         return None
 
-    @staticmethod
-    def process_message(message: Message, config: PostConfig) -> Dict[str, Any]:
+    def clean_message_text(self, message: StoredMessage) -> str:
+        """Remove autor e nome do canal do texto da mensagem"""
+        if not message.text:
+            return ""
+
+        text = message.text
+        for regex in self._regexes:
+            text = regex.sub('', text)
+
+        # Remove espaços extras
+        return ' '.join(text.split())
+
+    def build_context(self, message: StoredMessage, counter: int = 0, channel_name: str = "") -> Dict[str, Any]:
+        """Valores das variáveis do template (escapados para parse_mode='HTML')
+
+        Só calcula as variáveis que o template usa; {original} é sempre incluído.
+        """
+        fields = self.template.fields
+        context: Dict[str, Any] = {"original": html.escape(self.clean_message_text(message), quote=False)}
+        if "date" in fields:
+            context["date"] = datetime.fromtimestamp(message.date, self._tz).strftime("%d/%m/%Y")
+        if "channel_name" in fields:
+            context["channel_name"] = html.escape(channel_name, quote=False)
+        if "media_type" in fields:
+            context["media_type"] = MEDIA_TYPE_LABELS.get(message.media_kind, message.media_kind)
+        if "counter" in fields:
+            context["counter"] = counter
+        return context
+
+    def apply_template(self, context: Dict[str, Any]) -> str:
+        """Renderiza o template
+
+        Sem {original} no template, o texto original vai depois dele, separado por uma linha em branco.
+        """
+        original = context["original"]
+        if self.template.embeds_original or not original:
+            return self.template.render(context)
+        if not self.template.source:
+            return original
+        return f"{self.template.render(context)}\n\n{original}"
+
+    def get_button_markup(self) -> Optional[InlineKeyboardMarkup]:
+        """Markup do botão inline (compartilhado) ou None"""
+        return self._reply_markup
+
+    def process_message(self, message: StoredMessage, counter: int = 0) -> Dict[str, Any]:
         """Processa mensagem completa para repost
         
         Retorna um dicionário com os dados da mensagem original para copiar.
         A cópia real será feita no bot usando copy_message ou download/upload.
         """
-        # Limpa o texto
-        cleaned_text = PostProcessor.clean_message_text(message)
-        
-        # Aplica template
-        final_text = PostProcessor.apply_template(cleaned_text, config)
-        
+        context = self.build_context(message, counter)
+        final_text = self.apply_template(context)
+
         # Prepara dados da mensagem
         message_data = {
             'message': message,  # Mantém referência à mensagem original
             'text': final_text if final_text else None,
-            'caption': final_text if (message.video or message.photo or message.document or message.animation) else None,
-            'reply_markup': PostProcessor.get_button_markup(config),
-            'has_media': bool(message.video or message.photo or message.document or message.animation),
+            'caption': final_text if message.has_media else None,
+            'reply_markup': self._reply_markup,
+            'has_media': message.has_media,
+            'context': context,  # Para renderizar de novo por destino ({channel_name})
         }
-        
+
         return message_data
+
+    def process_group(self, messages: List[StoredMessage], counter: int = 0) -> Dict[str, Any]:
+        """Processa um álbum (media group) como uma única postagem
+
+        A legenda do álbum é a da primeira mensagem que tiver texto.
+        """
+        captioned = next((m for m in messages if m.text), messages[0])
+        message_data = self.process_message(captioned, counter)
+        message_data['message'] = messages[0]
+        message_data['group'] = messages
+        return message_data
+
+    def for_channel(self, message_data: Dict[str, Any], channel_name: str) -> Dict[str, Any]:
+        """Dados da postagem para um destino: só renderiza de novo se o template usa {channel_name}"""
+        if "channel_name" not in self.template.fields:
+            return message_data
+        context = dict(message_data['context'], channel_name=html.escape(channel_name, quote=False))
+        final_text = self.apply_template(context)
+        return dict(
+            message_data,
+            text=final_text if final_text else None,
+            caption=final_text if message_data['has_media'] else None,
+            context=context,
+        )
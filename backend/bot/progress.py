@@ -0,0 +1,57 @@
+"""
+Publicação do progresso: guarda só o estado mais recente e limita os envios por segundo
+"""
+import asyncio
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+class ProgressPublisher:
+    """Último estado do progresso, enviado ao callback no máximo `max_rate` vezes por segundo
+
+    Atualizações dentro do intervalo substituem o estado pendente e saem juntas no fim dele;
+    estados finais (`final=True`) saem na hora. Cada atualização traz uma função que monta
+    o estado: ela só roda quando o estado é usado (envio ou leitura de `snapshot`), então
+    atualizações substituídas não custam nada.
+    """
+
+    def __init__(self, snapshot: Dict[str, Any], max_rate: float = 4.0):
+        self._snapshot: Optional[Dict[str, Any]] = snapshot
+        self._build: Optional[Callable[[], Dict[str, Any]]] = None
+        self.callback: Optional[Callable[[dict], None]] = None
+        self.min_interval = 1 / max_rate if max_rate > 0 else 0
+        self._last_sent = 0.0  # time.monotonic() do último envio
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def snapshot(self) -> Dict[str, Any]:
+        """Estado mais recente (montado na primeira leitura após cada atualização)"""
+        if self._snapshot is None:
+            self._snapshot = self._build()
+        return self._snapshot
+
+    def update(self, build: Callable[[], Dict[str, Any]], final: bool = False):
+        self._build = build
+        self._snapshot = None
+        if self.callback is None:
+            return
+        wait = self._last_sent + self.min_interval - time.monotonic()
+        if final or wait <= 0:
+            self._send()
+        elif self._timer is None:
+            try:
+                self._timer = asyncio.get_running_loop().call_later(wait, self._send)
+            except RuntimeError:
+                self._send()  # Sem loop: não há como adiar
+
+    def _send(self):
+        self.close()
+        self._last_sent = time.monotonic()
+        if self.callback is not None:
+            self.callback(self.snapshot)
+
+    def close(self):
+        """Cancela o envio adiado (o estado pendente fica só no snapshot)"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
@@ -0,0 +1,178 @@
+"""
+Rate limiting das chamadas ao Bot API (limite global + limite por canal)
+"""
+import asyncio
+import logging
+import time
+import warnings
+from datetime import timedelta
+from typing import Any, Callable, Coroutine, Dict, Optional, Union
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+from telegram.warnings import PTBDeprecationWarning
+
+logger = logging.getLogger(__name__)
+
+# Endpoints que publicam/alteram mensagens em um chat e contam para o limite por canal
+_PER_CHAT_ENDPOINT_PREFIXES = ("send", "copy", "forward", "edit")
+
+
+class TokenBucket:
+    """Token bucket assíncrono: `rate` tokens por segundo, até `capacity` acumulados"""
+
+    __slots__ = ("rate", "capacity", "_tokens", "_updated", "_lock")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def level(self) -> float:
+        """Tokens disponíveis no momento"""
+        self._refill()
+        return self._tokens
+
+    @property
+    def is_full(self) -> bool:
+        return self.level >= self.capacity
+
+    async def acquire(self):
+        """Consome um token, aguardando a reposição se necessário"""
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+class TelegramRateLimiter(BaseRateLimiter):
+    """Aplica os limites do Telegram a todas as chamadas feitas pelo ExtBot
+
+    - bucket global (~30 msg/s) para qualquer requisição com chat_id;
+    - bucket por chat para envios/edições em canais (~20 msg/min);
+    - RetryAfter pausa apenas o chat afetado pelo tempo indicado e a requisição é refeita.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 30,
+        global_burst: float = 30,
+        per_chat_rate: float = 20 / 60,
+        per_chat_burst: float = 3,
+        max_retries: int = 3,
+    ):
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.max_retries = max_retries
+        self._chat_buckets: Dict[Union[int, str], TokenBucket] = {}
+        self._paused_until: Dict[Union[int, str], float] = {}
+        self.retry_after_count = 0
+
+    async def initialize(self) -> None:
+        """Nada a inicializar"""
+
+    async def shutdown(self) -> None:
+        """Nada a liberar"""
+
+    def _get_chat_bucket(self, chat_id: Union[int, str]) -> TokenBucket:
+        # Descarta buckets ociosos (cheios e sem pausa) quando acumulam muitos
+        if len(self._chat_buckets) > 512:
+            for key, bucket in list(self._chat_buckets.items()):
+                if key != chat_id and bucket.is_full and key not in self._paused_until:
+                    del self._chat_buckets[key]
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.per_chat_rate, self.per_chat_burst)
+        return bucket
+
+    async def _wait_pause(self, chat_id: Union[int, str]):
+        """Aguarda o fim de uma pausa por RetryAfter neste chat"""
+        until = self._paused_until.get(chat_id)
+        while until is not None:
+            remaining = until - time.monotonic()
+            if remaining <= 0:
+                if self._paused_until.get(chat_id) == until:
+                    del self._paused_until[chat_id]
+                return
+            await asyncio.sleep(remaining)
+            until = self._paused_until.get(chat_id)
+
+    @staticmethod
+    def _retry_after_seconds(exc: RetryAfter) -> float:
+        # PTB 22 avisa que retry_after passará a ser timedelta; aceita os dois formatos
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", PTBDeprecationWarning)
+            retry = exc.retry_after
+        if isinstance(retry, timedelta):
+            return retry.total_seconds()
+        return float(retry)
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Any]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[int],
+    ):
+        """Aplica os buckets e trata RetryAfter antes de repassar a chamada ao Bot API"""
+        max_retries = self.max_retries if rate_limit_args is None else rate_limit_args
+        chat_id = data.get("chat_id")
+        try:
+            chat_id = int(chat_id)
+        except (ValueError, TypeError):
+            pass
+        per_chat = chat_id is not None and endpoint.lower().startswith(_PER_CHAT_ENDPOINT_PREFIXES)
+
+        for attempt in range(max_retries + 1):
+            if chat_id is not None:
+                await self._wait_pause(chat_id)
+            if per_chat:
+                await self._get_chat_bucket(chat_id).acquire()
+            if chat_id is not None:
+                await self.global_bucket.acquire()
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as exc:
+                self.retry_after_count += 1
+                if attempt == max_retries:
+                    raise
+                delay = self._retry_after_seconds(exc) + 0.1
+                logger.warning(f"Flood limit em {chat_id} ({endpoint}): aguardando {delay:.1f}s")
+                if chat_id is not None:
+                    self._paused_until[chat_id] = time.monotonic() + delay
+                else:
+                    await asyncio.sleep(delay)
+        return None
+
+    def snapshot(self) -> dict:
+        """Níveis atuais dos buckets (para a API de status)"""
+        now = time.monotonic()
+        return {
+            "global": {
+                "tokens": round(self.global_bucket.level, 2),
+                "capacity": self.global_bucket.capacity,
+                "rate": self.global_bucket.rate,
+            },
+            "per_chat_rate": round(self.per_chat_rate, 4),
+            "per_chat_capacity": self.per_chat_burst,
+            "chats": {
+                str(chat_id): {
+                    "tokens": round(bucket.level, 2),
+                    "paused_for": round(max(0.0, self._paused_until.get(chat_id, now) - now), 1),
+                }
+                for chat_id, bucket in self._chat_buckets.items()
+            },
+            "retry_after_count": self.retry_after_count,
+        }
@@ -0,0 +1,194 @@
+"""
+Fila persistente de repost em SQLite (WAL): mensagens do estoque e estado de entrega por destino
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional, Set, Tuple
+from telegram import MessageEntity
+from backend.bot.config_storage import state_path
+from backend.bot.message_store import StoredMessage
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    storage_key TEXT NOT NULL,
+    message_id INTEGER NOT NULL,
+    chat_id INTEGER NOT NULL,
+    media_kind TEXT NOT NULL,
+    file_id TEXT,
+    file_unique_id TEXT,
+    file_name TEXT,
+    text TEXT,
+    entities TEXT,
+    date REAL NOT NULL,
+    media_group_id TEXT,
+    done INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (storage_key, message_id)
+);
+CREATE INDEX IF NOT EXISTS idx_messages_pending ON messages (done, date);
+CREATE TABLE IF NOT EXISTS deliveries (
+    storage_key TEXT NOT NULL,
+    message_id INTEGER NOT NULL,
+    channel_id TEXT NOT NULL,
+    success INTEGER NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (storage_key, message_id, channel_id)
+);
+"""
+
+
+class RepostQueue:
+    """Registra cada mensagem do estoque e a entrega por canal de destino
+
+    Permite que start_posting retome após reinício: mensagens não concluídas são
+    recarregadas e os destinos que já receberam a mensagem são pulados.
+    Cada entrega é gravada na hora (WAL com synchronous=NORMAL: commit barato), para que
+    um reinício não reenvie a quem já recebeu. Mensagens recebidas ficam num buffer e são
+    gravadas em uma única transação por `flush` (chamado a cada leva da fila de chegada).
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path or state_path("repost_queue.db")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Protegida por lock: segura mesmo quando usada fora do loop da API
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._pending_messages: List[Tuple] = []  # Linhas de `messages` ainda não gravadas
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+            # Bancos criados antes do suporte a álbuns
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(messages)")}
+            if "media_group_id" not in columns:
+                self._conn.execute("ALTER TABLE messages ADD COLUMN media_group_id TEXT")
+
+    def add_message(self, key: str, record: StoredMessage):
+        """Registra mensagem recebida do canal de estoque (gravada no próximo `flush`)"""
+        entities = json.dumps([e.to_dict() for e in record.entities]) if record.entities else None
+        with self._lock:
+            self._pending_messages.append(
+                (key, record.message_id, record.chat_id, record.media_kind, record.file_id,
+                 record.file_unique_id, record.file_name, record.text, entities, record.date,
+                 record.media_group_id)
+            )
+
+    def flush(self):
+        """Grava as mensagens recebidas pendentes em uma única transação"""
+        with self._lock:
+            self._flush_messages()
+
+    def _flush_messages(self):
+        # Chamado com o lock
+        if not self._pending_messages:
+            return
+        rows, self._pending_messages = self._pending_messages, []
+        with self._transaction():
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO messages "
+                "(storage_key, message_id, chat_id, media_kind, file_id, file_unique_id, file_name, text, entities, date, "
+                "media_group_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    @contextmanager
+    def _transaction(self):
+        """BEGIN/COMMIT explícitos (em autocommit, executemany gravaria linha a linha)"""
+        self._conn.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def load_pending(self) -> List[Tuple[str, StoredMessage]]:
+        """Mensagens ainda não concluídas, em ordem de chegada (uma única consulta)"""
+        with self._lock:
+            self._flush_messages()
+            rows = self._conn.execute(
+                "SELECT storage_key, message_id, chat_id, media_kind, file_id, file_unique_id, "
+                "file_name, text, entities, date, media_group_id FROM messages WHERE done = 0 "
+                "ORDER BY date, message_id"
+            ).fetchall()
+        pending = []
+        for key, message_id, chat_id, kind, file_id, unique_id, file_name, text, entities, date, group_id in rows:
+            parsed = tuple(MessageEntity.de_json(e, None) for e in json.loads(entities)) if entities else ()
+            pending.append((key, StoredMessage(
+                chat_id=chat_id,
+                message_id=message_id,
+                media_kind=kind,
+                file_id=file_id,
+                file_unique_id=unique_id,
+                file_name=file_name,
+                text=text,
+                entities=parsed,
+                date=date,
+                media_group_id=group_id,
+            )))
+        return pending
+
+    def delivered_channels(self, key: str, message_id: int) -> Set[str]:
+        """Destinos que já receberam a mensagem com sucesso"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT channel_id FROM deliveries WHERE storage_key = ? AND message_id = ? AND success = 1",
+                (key, message_id),
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def record_delivery(self, key: str, message_id: int, channel_id: str, success: bool):
+        """Grava o resultado de uma entrega (commit imediato)"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO deliveries (storage_key, message_id, channel_id, success, updated) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, message_id, channel_id, int(success), time.time()),
+            )
+
+    def mark_done(self, key: str, message_ids: List[int]):
+        """Conclui as mensagens de uma postagem (uma transação)"""
+        with self._lock:
+            self._flush_messages()
+            with self._transaction():
+                self._conn.executemany(
+                    "UPDATE messages SET done = 1 WHERE storage_key = ? AND message_id = ?",
+                    [(key, message_id) for message_id in message_ids],
+                )
+
+    def clear(self, key: Optional[str] = None):
+        """Remove mensagens (e entregas) de um canal ou de todos"""
+        with self._lock:
+            self._pending_messages = [row for row in self._pending_messages if key is not None and row[0] != key]
+            if key is None:
+                self._conn.execute("DELETE FROM deliveries")
+                self._conn.execute("DELETE FROM messages")
+            else:
+                self._conn.execute("DELETE FROM deliveries WHERE storage_key = ?", (key,))
+                self._conn.execute("DELETE FROM messages WHERE storage_key = ?", (key,))
+
+    def prune(self, max_age: Optional[float]):
+        """Apaga mensagens concluídas mais antigas que `max_age` segundos (as pendentes são mantidas)"""
+        if max_age is None:
+            return
+        cutoff = time.time() - max_age
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM deliveries WHERE (storage_key, message_id) IN "
+                "(SELECT storage_key, message_id FROM messages WHERE done = 1 AND date < ?)",
+                (cutoff,),
+            )
+            self._conn.execute("DELETE FROM messages WHERE done = 1 AND date < ?", (cutoff,))
+
+    def close(self):
+        with self._lock:
+            try:
+                self._flush_messages()
+            finally:
+                self._conn.close()
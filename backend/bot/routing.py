@@ -0,0 +1,99 @@
+"""
+Tabela de roteamento: canal de estoque -> destinos, PostProcessor e tipos de mídia aceitos
+"""
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple, Union
+from backend.models.config import Config, ChannelConfig, PostConfig
+from backend.bot.post_processor import PostProcessor
+
+ChatKey = Union[int, str]
+
+
+class Route:
+    """Rota de um canal de estoque, com tudo que a postagem precisa já resolvido"""
+
+    __slots__ = ("stock_channel", "key", "destinations", "media_types", "processor")
+
+    def __init__(
+        self,
+        stock_channel: ChannelConfig,
+        key: str,
+        destinations: Optional[FrozenSet[str]],
+        media_types: Optional[FrozenSet[str]],
+        processor: PostProcessor,
+    ):
+        self.stock_channel = stock_channel
+        self.key = key  # Chave de armazenamento (MessageStore/RepostQueue)
+        self.destinations = destinations  # None = todos os destinos
+        self.media_types = media_types  # None = todos os tipos postáveis
+        self.processor = processor
+
+    def accepts(self, media_kind: str) -> bool:
+        return self.media_types is None or media_kind in self.media_types
+
+
+class RoutingTable:
+    """Rotas indexadas pelo chat (ID/username) e pela chave de armazenamento
+
+    Montada uma vez por configuração e nunca alterada: quem troca a configuração
+    troca a tabela inteira, e as buscas do handler e do loop de postagem são O(1).
+    """
+
+    def __init__(
+        self,
+        config: Optional[Config],
+        normalize_channel_id: Callable[[str], ChatKey],
+        default_processor: Optional[PostProcessor] = None,
+    ):
+        self.routes: List[Route] = []
+        self._by_chat: Dict[ChatKey, Route] = {}
+        self._by_key: Dict[str, Route] = {}
+        if not config:
+            return
+        # Canal de estoque principal: todos os destinos, PostConfig global
+        specs: List[Tuple[ChannelConfig, Optional[List[str]], Optional[PostConfig], Optional[List[str]]]] = []
+        if config.stock_channel:
+            specs.append((config.stock_channel, None, None, None))
+        specs += [
+            (route.stock_channel, route.destinations, route.post_config, route.media_types)
+            for route in config.stock_routes
+        ]
+        default_processor = default_processor or PostProcessor(config.post_config)
+        for stock_channel, destinations, post_config, media_types in specs:
+            normalized_id = normalize_channel_id(stock_channel.channel_id)
+            key = str(normalized_id).lstrip('-')
+            if key in self._by_key:
+                continue  # Mesmo canal configurado duas vezes: vale a primeira rota
+            route = Route(
+                stock_channel,
+                key,
+                frozenset(destinations) if destinations is not None else None,
+                frozenset(media_types) if media_types is not None else None,
+                PostProcessor(post_config) if post_config else default_processor,
+            )
+            self.routes.append(route)
+            self._by_key[key] = route
+            for chat_key in self._chat_keys(normalized_id):
+                self._by_chat.setdefault(chat_key, route)
+
+    @staticmethod
+    def _chat_keys(normalized_id: ChatKey) -> Tuple[ChatKey, ...]:
+        """Formas como o chat do canal pode chegar no update"""
+        if isinstance(normalized_id, int):
+            if normalized_id > 0:
+                # ID informado sem o prefixo de canal (-100...)
+                return normalized_id, -normalized_id, int(f"-100{normalized_id}")
+            return (normalized_id,)
+        if normalized_id:
+            return (normalized_id.lower(),)  # Usernames não diferenciam maiúsculas
+        return ()
+
+    def match(self, chat_id: int, username: Optional[str] = None) -> Optional[Route]:
+        """Rota do chat do update (None se não for um canal de estoque)"""
+        route = self._by_chat.get(chat_id)
+        if route is None and username:
+            route = self._by_chat.get(username.lower())
+        return route
+
+    def get(self, key: str) -> Optional[Route]:
+        """Rota pela chave de armazenamento"""
+        return self._by_key.get(key)
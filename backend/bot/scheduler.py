@@ -0,0 +1,223 @@
+"""
+Agendamento por canal de destino: cada destino tem seu cursor e sua cadência, num único heap
+"""
+import heapq
+import itertools
+import random
+from collections import deque
+from typing import AbstractSet, Any, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+from backend.models.config import ChannelConfig
+from backend.bot.message_store import StoredMessage
+
+
+class PostEntry:
+    """Uma postagem (mensagem avulsa ou álbum) e os destinos que ainda não a receberam"""
+
+    __slots__ = ("unit", "message_data", "pending")
+
+    def __init__(self, unit: List[StoredMessage], message_data: Dict[str, Any], pending: Set[str]):
+        self.unit = unit
+        self.message_data = message_data
+        self.pending = pending
+
+    @property
+    def message(self) -> StoredMessage:
+        return self.unit[0]
+
+
+class ChannelCursor:
+    """Posição de um destino na fila de postagens e horário da sua próxima postagem"""
+
+    __slots__ = ("channel", "position", "remaining", "next_due", "in_flight", "scheduled", "_token")
+
+    def __init__(self, channel: ChannelConfig, position: int, next_due: float):
+        self.channel = channel
+        self.position = position  # Índice absoluto da próxima postagem na fila
+        self.remaining = 0  # Postagens na fila que este destino ainda não fez (incluindo a em andamento)
+        self.next_due = next_due  # Timestamp UNIX
+        self.in_flight = False
+        self.scheduled = False  # Está no heap
+        self._token = 0  # Invalida entradas antigas do heap (remoção preguiçosa)
+
+
+class DestinationScheduler:
+    """Fila de postagens compartilhada + heap de cursores ordenado pelo próximo horário
+
+    - cada destino avança na fila no seu ritmo: um canal lento ou com falha não segura os demais;
+    - após postar, o destino aguarda um delay sorteado na sua própria janela (`delay_window`);
+    - `next_slot` empurra o horário para dentro da janela de postagem do destino (horários silenciosos);
+    - `post_interval` dá o tempo médio entre postagens com um delay, contando as horas fechadas (previsão);
+    - só cursores com postagem pendente ficam no heap; o loop espera apenas pelo topo.
+    """
+
+    def __init__(
+        self,
+        delay_window: Callable[[ChannelConfig], Tuple[int, int]],
+        next_slot: Optional[Callable[[ChannelConfig, float], float]] = None,
+        post_interval: Optional[Callable[[ChannelConfig, float], float]] = None,
+    ):
+        self.delay_window = delay_window
+        self.next_slot = next_slot or (lambda channel, ts: ts)
+        self.post_interval = post_interval or (lambda channel, delay: delay)
+        self._entries: Deque[PostEntry] = deque()
+        self._base = 0  # Índice absoluto de _entries[0]
+        self._cursors: Dict[str, ChannelCursor] = {}
+        self._heap: List[Tuple[float, int, int, ChannelCursor]] = []
+        self._seq = itertools.count()
+
+    # --- destinos ---
+
+    def sync_channels(self, channels: Iterable[ChannelConfig], now: float):
+        """Aplica a lista de destinos: novos começam nas próximas postagens, removidos saem da fila"""
+        channels = list(channels)
+        wanted = {channel.channel_id for channel in channels}
+        for channel_id in [cid for cid in self._cursors if cid not in wanted]:
+            cursor = self._cursors.pop(channel_id)
+            cursor.scheduled = False
+            cursor._token += 1
+            for entry in self._entries:
+                entry.pending.discard(channel_id)
+        for channel in channels:
+            cursor = self._cursors.get(channel.channel_id)
+            if cursor is None:
+                self._cursors[channel.channel_id] = ChannelCursor(channel, self.end, now)
+            else:
+                cursor.channel = channel  # Nome/delay podem ter mudado
+
+    def has_any(self, channel_ids: AbstractSet[str]) -> bool:
+        """Algum dos destinos está na agenda"""
+        return any(channel_id in self._cursors for channel_id in channel_ids)
+
+    @property
+    def end(self) -> int:
+        return self._base + len(self._entries)
+
+    def _push(self, cursor: ChannelCursor, due: float):
+        cursor.next_due = due
+        cursor.scheduled = True
+        cursor._token += 1
+        heapq.heappush(self._heap, (due, next(self._seq), cursor._token, cursor))
+
+    def _schedule(self, cursor: ChannelCursor, now: float):
+        """Coloca o cursor no heap se ele tiver postagem pendente"""
+        if cursor.in_flight or self._cursors.get(cursor.channel.channel_id) is not cursor:
+            return
+        self._skip_delivered(cursor)
+        if cursor.position < self.end:
+            self._push(cursor, self.next_slot(cursor.channel, max(now, cursor.next_due)))
+
+    def _skip_delivered(self, cursor: ChannelCursor):
+        """Avança sobre postagens que este destino já recebeu (retomada) ou que não eram para ele"""
+        channel_id = cursor.channel.channel_id
+        # Postagens que não incluíam o destino podem ter saído da fila sem que ele avançasse
+        cursor.position = max(cursor.position, self._base)
+        while cursor.position < self.end and channel_id not in self._entries[cursor.position - self._base].pending:
+            cursor.position += 1
+
+    # --- postagens ---
+
+    def add_entry(
+        self,
+        unit: List[StoredMessage],
+        message_data: Dict[str, Any],
+        delivered: Set[str],
+        now: float,
+        targets: Optional[AbstractSet[str]] = None,
+    ) -> PostEntry:
+        """Enfileira uma postagem para os destinos (`targets`, padrão: todos) que ainda não a receberam"""
+        pending = {
+            cid for cid in self._cursors
+            if cid not in delivered and (targets is None or cid in targets)
+        }
+        entry = PostEntry(unit, message_data, pending)
+        self._entries.append(entry)
+        for channel_id in pending:
+            cursor = self._cursors[channel_id]
+            cursor.remaining += 1
+            if not cursor.scheduled:
+                self._schedule(cursor, now)
+        return entry
+
+    def next_due(self) -> Optional[float]:
+        """Horário da próxima postagem de qualquer destino (None se nada pendente)"""
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def _drop_stale(self):
+        while self._heap:
+            _, _, token, cursor = self._heap[0]
+            if token == cursor._token and self._cursors.get(cursor.channel.channel_id) is cursor:
+                return
+            heapq.heappop(self._heap)
+
+    def pop_due(self, now: float) -> List[Tuple[ChannelCursor, PostEntry]]:
+        """Retira os destinos cujo horário chegou, com a postagem que cada um deve fazer"""
+        due = []
+        while True:
+            self._drop_stale()
+            if not self._heap or self._heap[0][0] > now:
+                return due
+            _, _, _, cursor = heapq.heappop(self._heap)
+            cursor.scheduled = False
+            cursor._token += 1
+            self._skip_delivered(cursor)
+            if cursor.position >= self.end:
+                continue
+            cursor.in_flight = True
+            due.append((cursor, self._entries[cursor.position - self._base]))
+
+    def complete(self, cursor: ChannelCursor, entry: PostEntry, now: float) -> int:
+        """Registra a postagem do destino, agenda a próxima e retorna os segundos até ela"""
+        cursor.in_flight = False
+        cursor.position += 1
+        delay_min, delay_max = self.delay_window(cursor.channel)
+        delay = random.randint(delay_min, delay_max)
+        cursor.next_due = now + delay
+        if cursor.channel.channel_id in entry.pending:
+            entry.pending.discard(cursor.channel.channel_id)
+            cursor.remaining -= 1
+        self._schedule(cursor, now)
+        return int(cursor.next_due - now)
+
+    def pop_finished(self) -> List[PostEntry]:
+        """Remove do início da fila as postagens já entregues a todos os destinos"""
+        finished = []
+        while self._entries and not self._entries[0].pending:
+            finished.append(self._entries.popleft())
+            self._base += 1
+        return finished
+
+    def skip_delays(self, now: float):
+        """Antecipa para agora a próxima postagem de todos os destinos"""
+        for cursor in self._cursors.values():
+            cursor.next_due = min(cursor.next_due, now)
+            if not cursor.in_flight:
+                self._schedule(cursor, now)
+
+    # --- estado ---
+
+    @property
+    def busy(self) -> bool:
+        """Há postagens na fila ou envios em andamento"""
+        return bool(self._entries) or any(cursor.in_flight for cursor in self._cursors.values())
+
+    def next_post_in(self, now: float) -> Optional[int]:
+        """Segundos até a próxima postagem agendada (None se nada pendente)"""
+        due = self.next_due()
+        return None if due is None else max(0, int(due - now))
+
+    def eta(self, now: float) -> int:
+        """Segundos até o destino mais atrasado terminar sua fila (respeitando as janelas de postagem)
+
+        Uma conta por destino: a próxima postagem e, depois dela, `remaining - 1` intervalos médios.
+        """
+        worst = now
+        for cursor in self._cursors.values():
+            if not cursor.remaining:
+                continue
+            delay_min, delay_max = self.delay_window(cursor.channel)
+            interval = self.post_interval(cursor.channel, (delay_min + delay_max) / 2)
+            # Em andamento: a postagem atual termina agora, as seguintes após cada intervalo
+            ts = now if cursor.in_flight else self.next_slot(cursor.channel, max(now, cursor.next_due))
+            worst = max(worst, ts + (cursor.remaining - 1) * interval)
+        return int(worst - now)
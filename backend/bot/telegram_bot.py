@@ -1,45 +1,138 @@
 import asyncio
-import random
+import hashlib
+import time
+import httpx
 import logging
-from typing import List, Optional, Callable, Dict, TYPE_CHECKING
+from typing import List, Optional, Callable, Dict, Set, Tuple, Union, TYPE_CHECKING
 from datetime import datetime
-from telegram import Bot, Message
-from telegram.error import TelegramError
+from telegram import Message, Update, InputMediaPhoto, InputMediaVideo, InputMediaDocument
+from telegram.error import TelegramError, BadRequest, Forbidden
 from telegram.constants import ChatMemberStatus
-from telegram.ext import Application
+from telegram.ext import Application, ExtBot
+from telegram.request import HTTPXRequest
 from backend.models.config import Config, PostConfig, ChannelConfig, PostStatus, LogEntry, ChannelStats
 from backend.bot.post_processor import PostProcessor
+from backend.bot.message_store import MessageStore, StoredMessage
+from backend.bot.repost_queue import RepostQueue
+from backend.bot.chat_resolver import ChatResolverCache
+from backend.bot.rate_limiter import TelegramRateLimiter
+from backend.bot.media_relay import MediaRelay
+from backend.bot.file_id_cache import FileIdCache, sent_file_id
+from backend.bot.dedup_index import DedupIndex, content_key
+from backend.bot.scheduler import ChannelCursor, DestinationScheduler, PostEntry
+from backend.bot.time_windows import PostingWindows
+from backend.bot.routing import Route, RoutingTable
+from backend.bot.progress import ProgressPublisher
 
 if TYPE_CHECKING:
     from backend.bot.message_handler import setup_message_handler
 
 logger = logging.getLogger(__name__)
 
+# Tipos de mídia aceitos em send_media_group
+ALBUM_MEDIA_TYPES = {
+    "photo": InputMediaPhoto,
+    "video": InputMediaVideo,
+    "document": InputMediaDocument,
+}
+
+# Método de envio do Bot API para cada tipo de mídia
+MEDIA_SEND_METHODS = {
+    "video": "send_video",
+    "photo": "send_photo",
+    "document": "send_document",
+    "animation": "send_animation",
+}
+
 
 class TelegramBot:
-    def __init__(self, token: str):
-        self.bot = Bot(token=token)
+    def __init__(
+        self,
+        token: str,
+        connection_pool_size: int = 64,
+        keepalive_expiry: float = 60.0,
+        store_max_messages: int = 500,
+        store_max_age: Optional[float] = 7 * 24 * 3600,
+        persistent_queue: bool = False,
+        media_group_window: float = 1.5,
+        media_spool_size: int = 8 * 1024 * 1024,
+        media_memory_limit: int = 128 * 1024 * 1024,
+        file_id_cache_size: int = 2000,
+        persist_file_id_cache: bool = False,
+        webhook_url: Optional[str] = None,
+        webhook_secret: Optional[str] = None,
+        dedup_ttl: Optional[float] = 7 * 24 * 3600,
+        persist_dedup_index: bool = True,
+        progress_max_rate: float = 4.0,
+    ):
+        self.connection_pool_size = connection_pool_size  # Conexões HTTP simultâneas com a API
+        self.keepalive_expiry = keepalive_expiry  # Segundos que uma conexão ociosa fica aberta
+        # Todas as chamadas do bot passam pelo rate limiter (limite global + por canal)
+        self.rate_limiter = TelegramRateLimiter()
+        # Cliente HTTP único e de longa duração: aberto em initialize(), fechado em shutdown()
+        self.bot = ExtBot(token=token, rate_limiter=self.rate_limiter, request=self._build_request())
         self.token = token
+        # Fallback de reenvio: cada mídia é baixada uma vez e compartilhada entre os destinos
+        self.media_relay = MediaRelay(self.bot, spool_size=media_spool_size, memory_limit=media_memory_limit)
+        # file_unique_id original -> file_id já enviado: cada mídia sobe no máximo uma vez
+        self.file_id_cache = FileIdCache(max_entries=file_id_cache_size, persist=persist_file_id_cache)
+        # Mesma mídia + mesma legenda no mesmo canal de estoque: rejeitada na chegada dentro do TTL
+        self.dedup_index = DedupIndex(ttl=dedup_ttl, persist=persist_dedup_index)
         self.config: Optional[Config] = None
+        self._post_processor: Optional[PostProcessor] = None  # Compilado a partir de config.post_config
+        self._routing = RoutingTable(None, self._normalize_channel_id)  # Canais de estoque -> rotas
+        self._routing_source: tuple = (None,)
         self.status: PostStatus = PostStatus.IDLE
         self.current_progress = 0
         self.total_posts = 0
         self.remaining_time = 0
         self._total_posts_ever = 0  # Total acumulado de postagens (persistente)
         self._total_failures_ever = 0  # Total acumulado de falhas (persistente)
+        self._post_counter = 0  # Variável {counter} do template: postagens desde que o bot iniciou
         self.log_callback: Optional[Callable[[LogEntry], None]] = None
-        self.progress_callback: Optional[Callable[[dict], None]] = None
         self._stop_flag = False
         self._posting_task: Optional[asyncio.Task] = None
-        self._stored_messages: Dict[str, List[Message]] = {}
+        # Mensagens do canal de estoque: registros compactos com retenção limitada
+        # Mensagens descartadas antes de postar liberam a chave de deduplicação (um novo envio é aceito)
+        self.message_store = MessageStore(
+            max_messages=store_max_messages, max_age=store_max_age, on_discard=self._forget_content
+        )
+        # Fila persistente opcional (SQLite): sobrevive a reinícios e registra entregas por destino
+        self.repost_queue: Optional[RepostQueue] = None
+        if persistent_queue:
+            self.repost_queue = RepostQueue()
+            self.repost_queue.prune(store_max_age)
+            for storage_key, record in self.repost_queue.load_pending():
+                self.message_store.add(storage_key, record)
         self._application: Optional[Application] = None
-        self._polling_task: Optional[asyncio.Task] = None
+        # Modo webhook: updates chegam por WEBHOOK_PATH na própria API (sem polling)
+        self.webhook_url = webhook_url.rstrip("/") if webhook_url else None
+        self.webhook_secret = webhook_secret or hashlib.sha256(f"webhook:{token}".encode()).hexdigest()
+        self._application_ready = False
+        self._application_lock = asyncio.Lock()
+        self._webhook_active = False
         self._channel_stats: Dict[str, ChannelStats] = {}  # Estatísticas por channel_id
-        self._skip_next_delay = False  # Flag para pular próximo delay
+        self._scheduler: Optional[DestinationScheduler] = None  # Agendador da sessão de postagem ativa
+        # Sem fila persistente: destinos que já receberam mensagens ainda não concluídas (retomada após parar)
+        self._partial_deliveries: Dict[Tuple[str, int], Set[str]] = {}
+        # Último estado do progresso (lido por get_status) e envio limitado aos clientes
+        self.progress = ProgressPublisher(self._progress_snapshot(0, 0, 0, time.time()), max_rate=progress_max_rate)
+        self._windows_cache: Dict[str, Tuple[ChannelConfig, PostConfig, PostingWindows]] = {}
+        self._windows_warned: Set[str] = set()  # Destinos já avisados de janela que nunca abre
+        self._intake_queue: Optional[asyncio.Queue] = None  # Mensagens novas do canal de estoque
+        self._intake_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.media_group_window = media_group_window  # Segundos aguardando as demais partes de um álbum
+        self._pending_groups: Dict[str, Tuple[str, List[StoredMessage]]] = {}
+        self._group_timers: Dict[str, asyncio.TimerHandle] = {}
+        self._chat_cache = ChatResolverCache()  # channel_id configurado -> chat.id resolvido
+        self._bot_ready = False  # Cliente HTTP do bot aberto
+        self._bot_init_lock = asyncio.Lock()
 
     def set_config(self, config: Config):
         """Define a configuração do bot"""
         self.config = config
+        self._post_processor = PostProcessor(config.post_config) if config else None
+        self._build_routing()
         # Inicializa estatísticas para canais de destino se não existirem
         if config and config.destination_channels:
             for channel in config.destination_channels:
@@ -52,27 +145,207 @@ class TelegramBot:
                         is_active=True,
                         status="active"
                     )
+        # Descarta resoluções de canais que saíram da configuração e resolve os novos
+        self._chat_cache.retain(ch.channel_id for ch in (config.destination_channels if config else []))
+        if config and config.destination_channels:
+            try:
+                asyncio.get_running_loop().create_task(self._warm_chat_cache())
+            except RuntimeError:
+                pass  # Sem loop ativo: resolve na primeira postagem
+        # Loop de postagem ativo reavalia os destinos
+        if self._scheduler:
+            self._wake_posting_loop()
         # Reinicia polling se necessário para aplicar nova configuração
-        if self._application and not self._polling_task:
-            asyncio.create_task(self._start_polling())
+        if self._application and not self._intake_active():
+            asyncio.create_task(self._start_intake())
+
+    def set_stock_channel(self, channel: Optional[ChannelConfig]):
+        """Troca o canal de estoque e reconstrói a tabela de roteamento"""
+        if not self.config:
+            self.config = Config()
+        self.config.stock_channel = channel
+        self._build_routing()
+
+    def _routing_inputs(self) -> tuple:
+        config = self.config
+        if not config:
+            return (None,)
+        return (config, config.stock_channel, config.stock_routes, config.post_config)
+
+    def _build_routing(self):
+        """Monta a tabela de roteamento dos canais de estoque
+
+        A tabela é imutável e trocada de uma vez, então o handler e o loop de postagem
+        nunca veem um estado parcial.
+        """
+        source = self._routing_inputs()
+        default_processor = self.post_processor if self.config else None
+        self._routing = RoutingTable(self.config, self._normalize_channel_id, default_processor)
+        self._routing_source = source
+
+    @property
+    def routing(self) -> RoutingTable:
+        """Tabela de roteamento atual (reconstruída só quando a configuração muda)"""
+        source = self._routing_inputs()
+        if len(source) != len(self._routing_source) or any(
+            a is not b for a, b in zip(source, self._routing_source)
+        ):
+            self._build_routing()
+        return self._routing
+
+    def set_post_config(self, post_config: PostConfig):
+        """Troca a configuração de postagem e recompila o PostProcessor"""
+        if not self.config:
+            self.config = Config()
+        self.config.post_config = post_config
+        self._post_processor = PostProcessor(post_config)
+        self._build_routing()
+
+    @property
+    def post_processor(self) -> PostProcessor:
+        """PostProcessor da PostConfig atual (recompilado só quando a configuração muda)"""
+        post_config = self.config.post_config
+        if self._post_processor is None or self._post_processor.config is not post_config:
+            self._post_processor = PostProcessor(post_config)
+        return self._post_processor
 
     def set_log_callback(self, callback: Callable[[LogEntry], None]):
         """Define callback para logs"""
         self.log_callback = callback
 
     def set_progress_callback(self, callback: Callable[[dict], None]):
-        """Define callback para progresso"""
-        self.progress_callback = callback
+        """Define callback para progresso (chamado no máximo progress_max_rate vezes por segundo)"""
+        self.progress.callback = callback
 
-    def store_message(self, channel_id: str, message: Message):
-        """Armazena mensagem recebida do canal"""
-        # Normaliza o ID para usar como chave de armazenamento
-        normalized_id = self._normalize_channel_id(channel_id)
-        storage_key = str(normalized_id).lstrip('-')
+    def _storage_key(self, channel_id: str) -> str:
+        """Chave de armazenamento de um canal (ID normalizado sem sinal)"""
+        return str(self._normalize_channel_id(channel_id)).lstrip('-')
+
+    def store_message(self, channel_id: str, message: Message) -> bool:
+        """Armazena mensagem recebida do canal (apenas o registro compacto)
+
+        Retorna False se a mensagem foi rejeitada (tipo filtrado, repetida ou duplicata de conteúdo).
+        """
+        storage_key = self._storage_key(channel_id)
+        record = StoredMessage.from_message(message)
+        route = self.routing.get(storage_key)
+        if route is not None and not route.accepts(record.media_kind):
+            logger.debug(f"Mensagem {record.message_id} ignorada: tipo {record.media_kind} filtrado pela rota")
+            return False
+        if self.message_store.get(storage_key, record.message_id) is not None:
+            return False  # Já armazenada (update repetido)
+        if self.dedup_index.seen(content_key(storage_key, record)):
+            self._log(f"♻️ Mensagem {record.message_id} ignorada: mesmo conteúdo já recebido do canal de estoque", "warning")
+            return False
+        if not self.message_store.add(storage_key, record):
+            return False  # Já armazenada
+        if self.repost_queue:
+            self.repost_queue.add_message(storage_key, record)
+            if self._intake_queue is None:
+                self.repost_queue.flush()  # Sem loop de postagem para gravar a leva
         
-        if storage_key not in self._stored_messages:
-            self._stored_messages[storage_key] = []
-        self._stored_messages[storage_key].append(message)
+        # Acorda o loop de postagem (seguro também fora do loop da API)
+        if route is not None:
+            self._push_intake(storage_key, record)
+        return True
+
+    def _forget_content(self, storage_key: str, records: List[StoredMessage]):
+        """Remove do índice de deduplicação as mensagens descartadas sem terem sido postadas"""
+        self.dedup_index.discard(content_key(storage_key, record) for record in records)
+
+    def _push_intake(self, storage_key: Optional[str], item: Optional[StoredMessage]):
+        """Entrega item ao loop de postagem de forma segura entre threads (None acorda sem mensagem)"""
+        loop = self._intake_loop
+        if self._intake_queue is None or loop is None:
+            return
+        try:
+            if asyncio.get_running_loop() is loop:
+                self._accept_intake(storage_key, item)
+                return
+        except RuntimeError:
+            pass
+        try:
+            loop.call_soon_threadsafe(self._accept_intake, storage_key, item)
+        except RuntimeError:
+            pass  # Loop encerrado
+
+    def _accept_intake(self, storage_key: Optional[str], item: Optional[StoredMessage]):
+        """Enfileira uma postagem; mensagens de álbum aguardam a janela de agrupamento (roda no loop)"""
+        queue = self._intake_queue
+        if queue is None:
+            return
+        if item is None:
+            queue.put_nowait(None)
+            return
+        if not item.media_group_id:
+            queue.put_nowait((storage_key, [item]))
+            return
+        # Álbum: reinicia a janela a cada nova parte e publica o grupo inteiro ao final
+        group_id = item.media_group_id
+        self._pending_groups.setdefault(group_id, (storage_key, []))[1].append(item)
+        timer = self._group_timers.pop(group_id, None)
+        if timer:
+            timer.cancel()
+        self._group_timers[group_id] = self._intake_loop.call_later(
+            self.media_group_window, self._flush_group, group_id
+        )
+
+    def _flush_group(self, group_id: str):
+        """Publica um álbum completo como uma única postagem"""
+        self._group_timers.pop(group_id, None)
+        pending = self._pending_groups.pop(group_id, None)
+        if pending and self._intake_queue is not None:
+            storage_key, group = pending
+            self._intake_queue.put_nowait((storage_key, sorted(group, key=lambda r: r.message_id)))
+
+    @staticmethod
+    def _group_units(records: List[StoredMessage]) -> List[List[StoredMessage]]:
+        """Agrupa mensagens em postagens (álbuns juntos), mantendo a ordem de chegada"""
+        units: List[List[StoredMessage]] = []
+        groups: Dict[str, List[StoredMessage]] = {}
+        for record in records:
+            if not record.media_group_id:
+                units.append([record])
+            elif record.media_group_id in groups:
+                groups[record.media_group_id].append(record)
+            else:
+                groups[record.media_group_id] = [record]
+                units.append(groups[record.media_group_id])
+        return units
+
+    def _open_intake(self, routes: List[Route]):
+        """Cria a fila de chegada e enfileira o que já estava armazenado nos canais de estoque"""
+        self._intake_loop = asyncio.get_running_loop()
+        self._intake_queue = asyncio.Queue()
+        for route in routes:
+            for unit in self._group_units(self.message_store.pending(route.key)):
+                self._intake_queue.put_nowait((route.key, unit))
+
+    def _close_intake(self):
+        """Desativa a fila de chegada"""
+        for timer in self._group_timers.values():
+            timer.cancel()
+        self._group_timers.clear()
+        self._pending_groups.clear()
+        self._intake_queue = None
+        self._intake_loop = None
+
+    def _drain_intake(self) -> List[Tuple[str, List[StoredMessage]]]:
+        """Retira todas as postagens já enfileiradas, sem aguardar"""
+        units = []
+        while self._intake_queue is not None and not self._intake_queue.empty():
+            item = self._intake_queue.get_nowait()
+            if item is not None:
+                units.append(item)
+        return units
+
+    async def _wait_intake(self, timeout: float) -> List[Tuple[str, List[StoredMessage]]]:
+        """Aguarda a próxima postagem e retorna ela junto com as que chegaram em seguida"""
+        try:
+            first = await asyncio.wait_for(self._intake_queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return []
+        return ([first] if first is not None else []) + self._drain_intake()
 
     def _format_time(self, seconds: int) -> str:
         """Formata tempo em segundos para formato legível"""
@@ -97,6 +370,9 @@ class TelegramBot:
 
     def _log(self, message: str, level: str = "info"):
         """Envia log via callback"""
+        # Erros de rede podem trazer URLs da API (com o token): o histórico de logs é público
+        if self.token in message:
+            message = message.replace(self.token, "<token>")
         log_entry = LogEntry(
             timestamp=datetime.now().strftime("%H:%M:%S"),
             message=message,
@@ -109,20 +385,35 @@ class TelegramBot:
             message
         )
 
-    def _update_progress(self, current: int, total: int, remaining_time: int):
-        """Atualiza progresso via callback"""
+    def _progress_snapshot(self, current: int, total: int, remaining_time: int, now: float) -> dict:
+        scheduler = self._scheduler
+        busy = scheduler is not None and scheduler.busy
+        return {
+            "current": current,
+            "total": total,
+            "remaining_time": remaining_time,
+            "next_post_in": scheduler.next_post_in(now) if busy else None,  # Segundos até a próxima postagem
+            "status": self.status.value,
+            "total_posts_ever": self._total_posts_ever,  # Inclui totais acumulados
+            "total_failures_ever": self._total_failures_ever,
+            "updated_at": now,
+        }
+
+    def _update_progress(self, current: int, total: int, remaining_time: Union[int, Callable[[], int]]):
+        """Atualiza o snapshot do progresso e avisa os clientes (envios agrupados)
+
+        Fim de ciclo (tudo processado, zerado ou parado) é enviado na hora. `remaining_time`
+        pode ser uma função: só é calculado quando o snapshot é enviado ou lido.
+        """
         self.current_progress = current
         self.total_posts = total
-        self.remaining_time = remaining_time
-        if self.progress_callback:
-            self.progress_callback({
-                "current": current,
-                "total": total,
-                "remaining_time": remaining_time,
-                "status": self.status.value,
-                "total_posts_ever": self._total_posts_ever,  # Inclui totais acumulados
-                "total_failures_ever": self._total_failures_ever
-            })
+
+        def build() -> dict:
+            remaining = remaining_time() if callable(remaining_time) else remaining_time
+            self.remaining_time = remaining
+            return self._progress_snapshot(current, total, remaining, time.time())
+
+        self.progress.update(build, final=current >= total or self.status != PostStatus.RUNNING)
 
     def _normalize_channel_id(self, channel_id: str):
         """Normaliza o ID do canal para diferentes formatos"""
@@ -145,284 +436,433 @@ class TelegramBot:
         # Retorna como string (username ou ID string)
         return clean_id
     
-    async def get_channel_messages(self, channel_id: str, limit: int = 100) -> List[Message]:
-        """Obtém mensagens do canal de estoque - confia principalmente em mensagens armazenadas via polling"""
+    async def get_channel_messages(self, channel_id: str, limit: int = 100) -> List[StoredMessage]:
+        """Obtém mensagens armazenadas do canal de estoque (recebidas via polling)"""
+        return self.message_store.list(self._storage_key(channel_id), limit)
+
+    def _build_request(self) -> HTTPXRequest:
+        """Cria o cliente HTTP com pool de conexões persistentes (keep-alive)"""
+        return HTTPXRequest(
+            connection_pool_size=self.connection_pool_size,
+            httpx_kwargs={
+                "limits": httpx.Limits(
+                    max_connections=self.connection_pool_size,
+                    max_keepalive_connections=self.connection_pool_size,
+                    keepalive_expiry=self.keepalive_expiry,
+                )
+            },
+        )
+
+    async def _ensure_bot_ready(self):
+        """Garante que o cliente HTTP do bot está aberto
+        
+        O cliente é aberto uma única vez (em initialize() ou no primeiro envio)
+        e só é fechado em shutdown(), evitando handshake a cada postagem.
+        """
+        if self._bot_ready:
+            return
+        async with self._bot_init_lock:
+            if not self._bot_ready:
+                await self.bot.initialize()
+                self._bot_ready = True
+
+    def _build_chat_id_formats(self, channel_id: str) -> list:
+        """Monta a lista de formatos de ID a tentar para acessar um canal"""
+        normalized_id = self._normalize_channel_id(channel_id)
+        formats_to_try = [channel_id]  # Tenta o ID original primeiro
+        
+        # Depois tenta o ID normalizado
+        if normalized_id != channel_id:
+            formats_to_try.append(normalized_id)
+        
+        # Se for string, tenta também com @
+        if isinstance(normalized_id, str) and not normalized_id.startswith('@'):
+            formats_to_try.append(f"@{normalized_id}")
+        
+        # Se for número, tenta também como string e formatos alternativos
+        if isinstance(normalized_id, int):
+            # Para canais privados, mantém o formato negativo
+            if normalized_id < 0:
+                # IDs negativos devem ser mantidos como estão
+                # O Telegram aceita IDs negativos diretamente
+                formats_to_try.extend([
+                    normalized_id,  # Como int negativo (prioridade)
+                    str(normalized_id),  # Como string negativa
+                ])
+            else:
+                # ID positivo, tenta formatos alternativos
+                formats_to_try.extend([
+                    normalized_id,
+                    str(normalized_id),
+                    f"-100{normalized_id}",
+                    f"-100{normalized_id:0>13}",
+                ])
+        elif isinstance(normalized_id, str):
+            # Se for string numérica, tenta como int também
+            try:
+                num_id = int(normalized_id)
+                if num_id < 0:
+                    # IDs negativos devem ser mantidos como estão
+                    formats_to_try.extend([
+                        num_id,  # Como int negativo (prioridade)
+                        str(num_id),  # Como string negativa
+                    ])
+                else:
+                    formats_to_try.extend([
+                        num_id,
+                        str(num_id),
+                        f"-100{num_id}",
+                        f"-100{num_id:0>13}",
+                    ])
+            except ValueError:
+                pass
+        
+        # Remove duplicatas mantendo ordem
+        seen = set()
+        unique_formats = []
+        for fmt in formats_to_try:
+            fmt_str = str(fmt)
+            if fmt_str not in seen:
+                seen.add(fmt_str)
+                unique_formats.append(fmt)
+        return unique_formats
+
+    async def _resolve_destination(self, channel_id: str) -> Optional[dict]:
+        """Resolve o canal de destino para {'chat_id', 'title'} usando o cache quando possível
+        
+        Deve ser chamado com o bot inicializado (ver `_ensure_bot_ready()`).
+        """
+        cached = self._chat_cache.get(channel_id)
+        if cached:
+            return cached
+        
+        formats_to_try = self._build_chat_id_formats(channel_id)
+        
+        # Tenta cada formato até encontrar um que funcione
+        last_error = None
+        for idx, chat_id_format in enumerate(formats_to_try):
+            try:
+                dest_chat = await self.bot.get_chat(chat_id=chat_id_format)
+                self._chat_cache.set(channel_id, dest_chat.id, dest_chat.title)
+                return self._chat_cache.get(channel_id)
+            except TelegramError as e:
+                last_error = e
+                # Log apenas se for a última tentativa ou se for um erro diferente de "Chat not found"
+                if chat_id_format == formats_to_try[-1] or (hasattr(e, 'message') and 'not found' not in str(e).lower()):
+                    self._log(f"Tentativa {idx+1}/{len(formats_to_try)} com formato '{chat_id_format}': {str(e)}", "debug")
+                continue
+        
+        self._log(f"Erro ao acessar canal de destino {channel_id}: {str(last_error) if last_error else 'Nenhum formato funcionou'}", "error")
+        self._log(f"Tentados {len(formats_to_try)} formatos: " + ", ".join(str(f) for f in formats_to_try[:5]) + (f" ... (+{len(formats_to_try)-5} mais)" if len(formats_to_try) > 5 else ""), "info")
+        self._log("Certifique-se de que:", "warning")
+        self._log("1. O bot é admin do canal de destino", "warning")
+        self._log("2. O bot tem permissão para enviar mensagens", "warning")
+        self._log("3. O ID do canal está correto", "warning")
+        return None
+
+    async def _warm_chat_cache(self):
+        """Resolve antecipadamente todos os canais de destino ainda não presentes no cache"""
+        if not self.config or not self.config.destination_channels:
+            return
+        pending = [ch for ch in self.config.destination_channels if not self._chat_cache.get(ch.channel_id)]
+        if not pending:
+            return
         try:
-            # Normaliza o ID do canal
-            normalized_id = self._normalize_channel_id(channel_id)
-            
-            # Para verificação de mensagens armazenadas, usa string
-            storage_key = str(normalized_id).lstrip('-')
-            
-            # PRIMEIRO: Sempre tenta obter mensagens armazenadas (via polling)
-            if storage_key in self._stored_messages:
-                stored = self._stored_messages[storage_key]
-                if len(stored) > 0:
-                    return stored[-limit:] if len(stored) > limit else stored
-            
-            # Se não há mensagens armazenadas, retorna vazio
-            # O sistema confia no polling para receber novas mensagens
-            # Não tenta acessar o canal via API pois isso pode causar erros
-            return []
-            
+            await self._ensure_bot_ready()
+            for channel in pending:
+                await self._resolve_destination(channel.channel_id)
         except Exception as e:
-            # Não loga erro aqui para evitar spam de logs
-            # As mensagens serão recebidas via polling automaticamente
-            return []
+            logger.error(f"Erro ao resolver canais de destino: {e}")
+
+    @staticmethod
+    def _is_chat_unavailable(error: TelegramError) -> bool:
+        """Indica se o erro significa que o canal não existe mais ou o bot perdeu acesso"""
+        if isinstance(error, Forbidden):
+            return True
+        return isinstance(error, BadRequest) and 'chat not found' in str(error).lower()
 
     async def post_to_channel(self, channel_id: str, message_data: dict) -> bool:
         """Posta mensagem processada em um canal usando copy_message quando possível"""
         try:
-            # Normaliza o ID do canal
-            normalized_id = self._normalize_channel_id(channel_id)
             original_message = message_data.get('message')
             
             if not original_message:
                 return False
             
-            async with self.bot:
-                # Tenta diferentes formatos de ID para acessar o canal
-                # Primeiro tenta o ID original exatamente como foi fornecido
-                dest_chat = None
-                formats_to_try = [channel_id]  # Tenta o ID original primeiro
-                
-                # Depois tenta o ID normalizado
-                if normalized_id != channel_id:
-                    formats_to_try.append(normalized_id)
-                
-                # Se for string, tenta também com @
-                if isinstance(normalized_id, str) and not normalized_id.startswith('@'):
-                    formats_to_try.append(f"@{normalized_id}")
-                
-                # Se for número, tenta também como string e formatos alternativos
-                if isinstance(normalized_id, int):
-                    # Para canais privados, mantém o formato negativo
-                    if normalized_id < 0:
-                        # IDs negativos devem ser mantidos como estão
-                        # O Telegram aceita IDs negativos diretamente
-                        formats_to_try.extend([
-                            normalized_id,  # Como int negativo (prioridade)
-                            str(normalized_id),  # Como string negativa
-                        ])
-                    else:
-                        # ID positivo, tenta formatos alternativos
-                        formats_to_try.extend([
-                            normalized_id,
-                            str(normalized_id),
-                            f"-100{normalized_id}",
-                            f"-100{normalized_id:0>13}",
-                        ])
-                elif isinstance(normalized_id, str):
-                    # Se for string numérica, tenta como int também
-                    try:
-                        num_id = int(normalized_id)
-                        if num_id < 0:
-                            # IDs negativos devem ser mantidos como estão
-                            formats_to_try.extend([
-                                num_id,  # Como int negativo (prioridade)
-                                str(num_id),  # Como string negativa
-                            ])
-                        else:
-                            formats_to_try.extend([
-                                num_id,
-                                str(num_id),
-                                f"-100{num_id}",
-                                f"-100{num_id:0>13}",
-                            ])
-                    except ValueError:
-                        pass
-                
-                # Remove duplicatas mantendo ordem
-                seen = set()
-                unique_formats = []
-                for fmt in formats_to_try:
-                    fmt_str = str(fmt)
-                    if fmt_str not in seen:
-                        seen.add(fmt_str)
-                        unique_formats.append(fmt)
-                formats_to_try = unique_formats
-                
-                # Tenta cada formato até encontrar um que funcione
-                dest_chat = None
-                last_error = None
-                for idx, chat_id_format in enumerate(formats_to_try):
-                    try:
-                        dest_chat = await self.bot.get_chat(chat_id=chat_id_format)
-                        self._log(f"Postando no canal: {dest_chat.title or chat_id_format} (ID: {dest_chat.id})", "info")
-                        break
-                    except TelegramError as e:
-                        last_error = e
-                        # Log apenas se for a última tentativa ou se for um erro diferente de "Chat not found"
-                        if chat_id_format == formats_to_try[-1] or (hasattr(e, 'message') and 'not found' not in str(e).lower()):
-                            self._log(f"Tentativa {idx+1}/{len(formats_to_try)} com formato '{chat_id_format}': {str(e)}", "debug")
-                        continue
-                
-                if not dest_chat:
-                    self._log(f"Erro ao acessar canal de destino {channel_id}: {str(last_error) if last_error else 'Nenhum formato funcionou'}", "error")
-                    self._log(f"Tentados {len(formats_to_try)} formatos: " + ", ".join(str(f) for f in formats_to_try[:5]) + (f" ... (+{len(formats_to_try)-5} mais)" if len(formats_to_try) > 5 else ""), "info")
-                    self._log("Certifique-se de que:", "warning")
-                    self._log("1. O bot é admin do canal de destino", "warning")
-                    self._log("2. O bot tem permissão para enviar mensagens", "warning")
-                    self._log("3. O ID do canal está correto", "warning")
-                    return False
-                
-                # Usa o ID real do chat retornado pela API (mais confiável)
-                clean_channel_id = dest_chat.id
-                
-                # Se tiver mídia, tenta copiar a mensagem
-                if message_data.get('has_media'):
-                    try:
-                        # Copia a mensagem (isso preserva a mídia)
-                        copied = await self.bot.copy_message(
-                            chat_id=clean_channel_id,
-                            from_chat_id=original_message.chat_id,
-                            message_id=original_message.message_id
-                        )
-                        
-                        # Se tiver caption customizado ou botão, edita a mensagem
-                        if message_data.get('caption') or message_data.get('reply_markup'):
-                            try:
-                                if original_message.video or original_message.photo:
-                                    await self.bot.edit_message_caption(
-                                        chat_id=clean_channel_id,
-                                        message_id=copied.message_id,
-                                        caption=message_data.get('caption'),
-                                        reply_markup=message_data.get('reply_markup'),
-                                        parse_mode='HTML'  # Suporta formatação HTML
-                                    )
-                                elif message_data.get('reply_markup'):
-                                    # Apenas atualiza o botão para documentos/animações
-                                    await self.bot.edit_message_reply_markup(
-                                        chat_id=clean_channel_id,
-                                        message_id=copied.message_id,
-                                        reply_markup=message_data.get('reply_markup')
-                                    )
-                                    # Para documentos, tenta editar o caption também
-                                    if message_data.get('caption'):
-                                        try:
-                                            await self.bot.edit_message_caption(
-                                                chat_id=clean_channel_id,
-                                                message_id=copied.message_id,
-                                                caption=message_data.get('caption'),
-                                                parse_mode='HTML'  # Suporta formatação HTML
-                                            )
-                                        except:
-                                            pass  # Alguns tipos de mídia não suportam caption editável
-                            except Exception as e:
-                                self._log(f"Erro ao editar mensagem copiada: {str(e)}", "warning")
-                                # Se não conseguir editar, deleta e reenvia com download
-                                try:
-                                    await self.bot.delete_message(chat_id=clean_channel_id, message_id=copied.message_id)
-                                    return await self._send_media_with_download(clean_channel_id, original_message, message_data)
-                                except:
-                                    pass
-                        
-                        return True
-                    except TelegramError as e:
-                        self._log(f"Erro ao copiar mensagem, tentando método alternativo: {str(e)}", "warning")
-                        # Fallback para método de download/upload
-                        return await self._send_media_with_download(clean_channel_id, original_message, message_data)
-                else:
-                    # Mensagem de texto simples
-                    await self.bot.send_message(
+            await self._ensure_bot_ready()
+            # Resolve o canal (cache persistente evita get_chat a cada postagem)
+            dest = await self._resolve_destination(channel_id)
+            if not dest:
+                return False
+            
+            # Usa o ID real do chat retornado pela API (mais confiável)
+            clean_channel_id = dest["chat_id"]
+            self._log(f"Postando no canal: {dest['title'] or channel_id} (ID: {clean_channel_id})", "info")
+            
+            # Álbum: uma única chamada por destino
+            if message_data.get('group'):
+                return await self._post_media_group(clean_channel_id, message_data)
+            
+            # Se tiver mídia, copia a mensagem já com legenda e botão finais (uma única chamada)
+            if message_data.get('has_media'):
+                try:
+                    await self.bot.copy_message(
                         chat_id=clean_channel_id,
-                        text=message_data.get('text', ''),
-                        reply_markup=message_data.get('reply_markup'),
-                        parse_mode='HTML'  # Suporta formatação HTML (negrito, itálico, links, etc.)
+                        from_chat_id=original_message.chat_id,
+                        message_id=original_message.message_id,
+                        caption=message_data.get('caption'),
+                        parse_mode='HTML' if message_data.get('caption') else None,  # Suporta formatação HTML
+                        reply_markup=message_data.get('reply_markup')
                     )
                     return True
+                except TelegramError as e:
+                    if self._is_chat_unavailable(e):
+                        raise
+                    self._log(f"Erro ao copiar mensagem, tentando método alternativo: {str(e)}", "warning")
+                    # Fallback para método de download/upload
+                    return await self._send_media_with_download(clean_channel_id, original_message, message_data)
+            else:
+                # Mensagem de texto simples
+                await self.bot.send_message(
+                    chat_id=clean_channel_id,
+                    text=message_data.get('text', ''),
+                    reply_markup=message_data.get('reply_markup'),
+                    parse_mode='HTML'  # Suporta formatação HTML (negrito, itálico, links, etc.)
+                )
+                return True
         except TelegramError as e:
+            if self._is_chat_unavailable(e):
+                self._chat_cache.invalidate(channel_id)
             self._log(f"Erro ao postar no canal {channel_id}: {str(e)}", "error")
             return False
         except Exception as e:
             self._log(f"Erro inesperado ao postar: {str(e)}", "error")
             return False
 
-    async def _send_media_with_download(self, channel_id: str, message: Message, message_data: dict) -> bool:
-        """Método alternativo: baixa e reenvia a mídia usando download_to_memory"""
-        try:
-            from io import BytesIO
-            
-            async with self.bot:
-                if message.video:
-                    file = await message.video.get_file()
-                    # Usa download_to_memory() que retorna bytes
-                    file_bytes = await file.download_to_memory()
-                    bio = BytesIO(file_bytes)
-                    bio.seek(0)
-                    await self.bot.send_video(
-                        chat_id=channel_id,
-                        video=bio,
-                        caption=message_data.get('caption'),
-                        reply_markup=message_data.get('reply_markup'),
-                        parse_mode='HTML'  # Suporta formatação HTML
-                    )
-                    return True
-                elif message.photo:
-                    # Pega a foto de maior resolução
-                    file = await message.photo[-1].get_file()
-                    file_bytes = await file.download_to_memory()
-                    bio = BytesIO(file_bytes)
-                    bio.seek(0)
-                    await self.bot.send_photo(
-                        chat_id=channel_id,
-                        photo=bio,
-                        caption=message_data.get('caption'),
-                        reply_markup=message_data.get('reply_markup'),
-                        parse_mode='HTML'  # Suporta formatação HTML
-                    )
-                    return True
-                elif message.document:
-                    file = await message.document.get_file()
-                    file_bytes = await file.download_to_memory()
-                    bio = BytesIO(file_bytes)
-                    bio.seek(0)
-                    await self.bot.send_document(
-                        chat_id=channel_id,
-                        document=bio,
-                        filename=message.document.file_name,
-                        caption=message_data.get('caption'),
-                        reply_markup=message_data.get('reply_markup'),
-                        parse_mode='HTML'  # Suporta formatação HTML
-                    )
-                    return True
-                elif message.animation:
-                    file = await message.animation.get_file()
-                    file_bytes = await file.download_to_memory()
-                    bio = BytesIO(file_bytes)
-                    bio.seek(0)
-                    await self.bot.send_animation(
-                        chat_id=channel_id,
-                        animation=bio,
-                        caption=message_data.get('caption'),
-                        reply_markup=message_data.get('reply_markup'),
-                        parse_mode='HTML'  # Suporta formatação HTML
-                    )
-                    return True
-            return False
-        except Exception as e:
-            self._log(f"Erro ao baixar e reenviar mídia: {str(e)}", "error")
-            # Tenta usar file_id como último recurso (pode não funcionar entre diferentes chats)
+    async def _post_media_group(self, chat_id: int, message_data: dict) -> bool:
+        """Posta um álbum com uma única chamada
+        
+        Com legenda definida, reenvia via send_media_group (file_id) para aplicar o template;
+        sem legenda, usa copy_messages, que preserva o álbum como está.
+        Álbuns não aceitam botões inline (reply_markup é ignorado).
+        """
+        group: List[StoredMessage] = message_data['group']
+        caption = message_data.get('caption')
+        if caption and all(record.media_kind in ALBUM_MEDIA_TYPES for record in group):
             try:
-                if message.video:
-                    await self.bot.send_video(
-                        chat_id=channel_id,
-                        video=message.video.file_id,
-                        caption=message_data.get('caption'),
-                        reply_markup=message_data.get('reply_markup')
-                    )
-                    return True
-                elif message.photo:
-                    await self.bot.send_photo(
-                        chat_id=channel_id,
-                        photo=message.photo[-1].file_id,
-                        caption=message_data.get('caption'),
-                        reply_markup=message_data.get('reply_markup')
+                media = [
+                    ALBUM_MEDIA_TYPES[record.media_kind](
+                        media=self._media_file_id(record),
+                        caption=caption if idx == 0 else None,
+                        parse_mode='HTML' if idx == 0 else None  # Suporta formatação HTML
                     )
+                    for idx, record in enumerate(group)
+                ]
+                await self.bot.send_media_group(chat_id=chat_id, media=media)
+                return True
+            except TelegramError as e:
+                if self._is_chat_unavailable(e):
+                    raise
+                self._log(f"Erro ao enviar álbum com legenda, copiando original: {str(e)}", "warning")
+        
+        await self.bot.copy_messages(
+            chat_id=chat_id,
+            from_chat_id=group[0].chat_id,
+            message_ids=[record.message_id for record in group]
+        )
+        return True
+
+    async def _send_media_with_download(self, channel_id: str, message: StoredMessage, message_data: dict) -> bool:
+        """Método alternativo: reenvia a mídia (upload no máximo uma vez, depois por file_id)"""
+        send_method = MEDIA_SEND_METHODS.get(message.media_kind)
+        if send_method is None:
+            return False
+        try:
+            await self._ensure_bot_ready()
+            async with self.file_id_cache.claim(message.file_unique_id) as cached_file_id:
+                if cached_file_id is None:
+                    # Primeiro destino: upload a partir da cópia compartilhada do MediaRelay
+                    async with self.media_relay.open(message) as media:
+                        sent = await self._send_media(send_method, channel_id, media, message, message_data)
+                    uploaded_file_id = sent_file_id(sent)
+                    self.file_id_cache.set(message.file_unique_id, uploaded_file_id)
+                    if uploaded_file_id:
+                        # Demais destinos usam o file_id: a cópia local não precisa esperar o fan-out
+                        self.media_relay.release(message)
                     return True
-            except Exception as e2:
-                self._log(f"Erro ao usar file_id: {str(e2)}", "error")
+            # Mídia já enviada por este bot: reutiliza o file_id, sem reenviar os bytes
+            try:
+                await self._send_media(send_method, channel_id, cached_file_id, message, message_data)
+                return True
+            except BadRequest as e:
+                if self._is_chat_unavailable(e):
+                    raise
+                self._log(f"file_id em cache recusado, reenviando mídia: {str(e)}", "warning")
+                self.file_id_cache.invalidate(message.file_unique_id)
+                async with self.media_relay.open(message) as media:
+                    sent = await self._send_media(send_method, channel_id, media, message, message_data)
+                self.file_id_cache.set(message.file_unique_id, sent_file_id(sent))
+                return True
+        except TelegramError as e:
+            # Chat indisponível sobe para post_to_channel invalidar o cache de chats
+            if self._is_chat_unavailable(e):
+                raise
+            return await self._send_media_last_resort(send_method, channel_id, message, message_data, e)
+        except Exception as e:
+            return await self._send_media_last_resort(send_method, channel_id, message, message_data, e)
+
+    async def _send_media_last_resort(self, send_method: str, channel_id: str, message: StoredMessage,
+                                      message_data: dict, error: Exception) -> bool:
+        """Tenta usar file_id como último recurso (pode não funcionar entre diferentes chats)"""
+        self._log(f"Erro ao baixar e reenviar mídia: {str(error)}", "error")
+        if message.media_kind not in ("video", "photo"):
             return False
+        try:
+            await self._send_media(send_method, channel_id, self._media_file_id(message), message, message_data)
+            return True
+        except Exception as e:
+            self._log(f"Erro ao usar file_id: {str(e)}", "error")
+        return False
+
+    def _media_file_id(self, message: StoredMessage) -> str:
+        """file_id para enviar a mídia: o já enviado por este bot, se houver, ou o original"""
+        return self.file_id_cache.get(message.file_unique_id) or message.file_id
+
+    async def _send_media(self, send_method: str, channel_id, media, message: StoredMessage, message_data: dict):
+        """Chama send_video/send_photo/send_document/send_animation com a legenda e o botão finais"""
+        kwargs = {}
+        if message.media_kind == "document":
+            kwargs["filename"] = message.file_name
+        return await getattr(self.bot, send_method)(
+            channel_id,
+            media,
+            caption=message_data.get('caption'),
+            reply_markup=message_data.get('reply_markup'),
+            parse_mode='HTML' if message_data.get('caption') else None,  # Suporta formatação HTML
+            **kwargs
+        )
+
+    def _channel_delay_window(self, channel: ChannelConfig) -> Tuple[int, int]:
+        """Janela de delay do destino: a do próprio canal, se definida, senão a da PostConfig"""
+        post_config = self.config.post_config
+        delay_min = channel.delay_min or post_config.delay_min
+        delay_max = channel.delay_max or post_config.delay_max
+        return delay_min, max(delay_min, delay_max)
+
+    def _channel_windows(self, channel: ChannelConfig, ts: float) -> PostingWindows:
+        """Janelas de postagem do destino (recalculadas só quando o canal ou a PostConfig mudam)"""
+        post_config = self.config.post_config
+        cached = self._windows_cache.get(channel.channel_id)
+        if cached is None or cached[0] is not channel or cached[1] is not post_config:
+            windows = PostingWindows(
+                channel.posting_windows if channel.posting_windows is not None else post_config.posting_windows,
+                channel.timezone or post_config.timezone,
+                post_config.quiet_hours,
+                post_config.timezone,
+            )
+            if not windows.unrestricted and windows.next_slot(ts) is None:
+                if channel.channel_id not in self._windows_warned:
+                    self._windows_warned.add(channel.channel_id)
+                    self._log(f"⚠️ Janela de postagem do canal '{channel.name}' nunca abre fora dos horários silenciosos - ignorando janelas", "warning")
+                # Sem as janelas do canal, mas ainda respeitando os horários silenciosos globais
+                windows = PostingWindows((), post_config.timezone, post_config.quiet_hours, post_config.timezone)
+            else:
+                self._windows_warned.discard(channel.channel_id)
+            cached = self._windows_cache[channel.channel_id] = (channel, post_config, windows)
+        return cached[2]
+
+    def _channel_next_slot(self, channel: ChannelConfig, ts: float) -> float:
+        """Primeiro horário >= ts dentro da janela de postagem do destino"""
+        windows = self._channel_windows(channel, ts)
+        if windows.unrestricted:
+            return ts
+        slot = windows.next_slot(ts)
+        return ts if slot is None else slot
+
+    def _channel_post_interval(self, channel: ChannelConfig, delay: float) -> float:
+        """Tempo médio entre postagens do destino, contando as horas fora da janela (previsão)"""
+        return self._channel_windows(channel, time.time()).post_interval(delay)
+
+    def _wake_posting_loop(self):
+        """Acorda o loop de postagem para reavaliar o agendamento (roda no loop)"""
+        if self._intake_queue is not None:
+            self._intake_queue.put_nowait(None)
+
+    async def _post_scheduled(
+        self,
+        scheduler: DestinationScheduler,
+        cursor: ChannelCursor,
+        entry: PostEntry,
+        semaphore: asyncio.Semaphore,
+    ):
+        """Posta uma mensagem em um destino e agenda a próxima postagem desse destino"""
+        channel = cursor.channel
+        route: Route = entry.message_data['route']
+        async with semaphore:
+            if self._stop_flag:
+                return
+            success = await self.post_to_channel(
+                channel.channel_id, route.processor.for_channel(entry.message_data, channel.name)
+            )
+        try:
+            if self.repost_queue:
+                self.repost_queue.record_delivery(route.key, entry.message.message_id, channel.channel_id, success)
+            elif success:
+                self._partial_deliveries.setdefault((route.key, entry.message.message_id), set()).add(channel.channel_id)
+        except Exception as e:
+            self._log(f"Erro ao registrar entrega no canal '{channel.name}': {str(e)}", "error")
+        finally:
+            # Sempre libera o cursor: senão o destino não posta mais nesta sessão
+            wait = scheduler.complete(cursor, entry, time.time())
+        self._update_channel_stats(channel.channel_id, channel.name, success)
+        
+        # Log com status de sucesso/falha e tempo até a próxima postagem deste canal
+        if success:
+            self._total_posts_ever += 1  # Incrementa total acumulado
+            status_msg = f"✅ SUCESSO: Postado no canal '{channel.name}'"
+            if cursor.scheduled:
+                status_msg += f" | Próxima postagem em {self._format_time(wait)}"
+            self._log(status_msg, "success")
+        else:
+            self._total_failures_ever += 1  # Incrementa total de falhas acumulado
+            error_msg = f"❌ FALHA: Erro ao postar no canal '{channel.name}'"
+            if cursor.scheduled:
+                error_msg += f" | Próxima tentativa em {self._format_time(wait)}"
+            self._log(error_msg, "error")
+        
+        try:
+            self._finish_entries(scheduler)
+        except Exception as e:
+            self._log(f"Erro ao concluir mensagens postadas: {str(e)}", "error")
+        finally:
+            self._wake_posting_loop()
+
+    def _finish_entries(self, scheduler: DestinationScheduler):
+        """Conclui as mensagens já entregues a todos os destinos e atualiza o progresso"""
+        finished = scheduler.pop_finished()
+        for entry in finished:
+            route: Route = entry.message_data['route']
+            # Só agora, com todos os destinos atendidos, a mensagem sai das pendentes (libera espaço no armazenamento)
+            for record in entry.unit:
+                self.message_store.mark_posted(route.key, record.message_id)
+            self._partial_deliveries.pop((route.key, entry.message.message_id), None)
+            if self.repost_queue:
+                self.repost_queue.mark_done(route.key, [record.message_id for record in entry.unit])
+            # Cópia local da mídia (se o fallback precisou baixar) não é mais necessária
+            self.media_relay.release(entry.message)
+            if not self._stop_flag:
+                self.current_progress += 1
+                self._log(f"📊 Progresso: {self.current_progress}/{self.total_posts} mensagens processadas", "info")
+        
+        if self._stop_flag:
+            return
+        if finished and not scheduler.busy:
+            # Fila vazia: reseta o progresso e continua aguardando
+            self._update_progress(0, 0, 0)
+            self._log("✅ Todas as mensagens foram processadas. Aguardando novas mensagens...", "info")
+        else:
+            # Previsão custa uma passada pelo agendador: só quando o progresso for de fato publicado
+            self._update_progress(self.current_progress, self.total_posts, lambda: scheduler.eta(time.time()))
 
     async def start_posting(self):
         """Inicia o processo de postagem - aguarda indefinidamente por mensagens"""
@@ -431,7 +871,8 @@ class TelegramBot:
             self.status = PostStatus.IDLE
             return
         
-        if not self.config.stock_channel:
+        routes = self.routing.routes
+        if not routes:
             self._log("Canal de estoque não configurado", "error")
             self.status = PostStatus.IDLE
             return
@@ -441,6 +882,14 @@ class TelegramBot:
             self.status = PostStatus.IDLE
             return
 
+        # Nunca reabre a flag de parada sob um loop anterior que ainda termina envios
+        previous = self._posting_task
+        current = asyncio.current_task()
+        if previous is not None and previous is not current and not previous.done():
+            self._log("Sessão anterior ainda finalizando envios - postagem não iniciada", "warning")
+            return
+        self._posting_task = current
+
         self.status = PostStatus.RUNNING
         self._stop_flag = False
         
@@ -451,154 +900,140 @@ class TelegramBot:
         
         self._log("🚀 Iniciando sistema de postagens automáticas...", "info")
         
-        # Garante que o polling está rodando
-        if not self._application or not (hasattr(self._application, '_running') and self._application._running):
+        # Garante que o recebimento de updates (polling ou webhook) está ativo
+        if not self._intake_active():
             self._log("📡 Iniciando conexão com Telegram...", "info")
-            await self._start_polling()
-            # Aguarda um pouco para o polling iniciar
-            await asyncio.sleep(2)
+            await self._start_intake()
         
-        # Obtém ID do canal de estoque
-        channel_id = self.config.stock_channel.channel_id
+        # Canais de estoque monitorados (um por rota)
         num_channels = len(self.config.destination_channels)
-        self._log(f"📥 Monitorando canal de estoque: {channel_id}", "info")
+        destination_ids = {channel.channel_id for channel in self.config.destination_channels}
+        for route in routes:
+            self._log(f"📥 Monitorando canal de estoque: {route.stock_channel.channel_id}", "info")
+            unknown = sorted(route.destinations - destination_ids) if route.destinations is not None else ()
+            if unknown:
+                self._log(f"⚠️ Rota do canal {route.stock_channel.channel_id} cita destinos não configurados: {', '.join(unknown)}", "warning")
         self._log(f"📤 {num_channels} canal{'is' if num_channels != 1 else ''} de destino configurado{'s' if num_channels != 1 else ''}", "info")
         self._log("⏳ Aguardando mensagens para repostar...", "info")
-        self._log("ℹ️ O sistema usa polling para receber mensagens automaticamente - não é necessário acessar o canal via API", "info")
+        if self.webhook_url:
+            self._log("ℹ️ O sistema recebe mensagens automaticamente via webhook - não é necessário acessar o canal via API", "info")
+        else:
+            self._log("ℹ️ O sistema usa polling para receber mensagens automaticamente - não é necessário acessar o canal via API", "info")
+        
+        # Fila de chegada: store_message acorda o loop assim que uma mensagem chega
+        self._open_intake(routes)
         
-        # Loop principal: aguarda mensagens indefinidamente
-        processed_message_ids = set()  # Rastreia mensagens já processadas
+        # Agendador: um cursor por destino, cada um postando no seu próprio ritmo
+        scheduler = DestinationScheduler(
+            self._channel_delay_window, self._channel_next_slot, self._channel_post_interval
+        )
+        self._scheduler = scheduler
+        destinations = self.config.destination_channels
+        scheduler.sync_channels(destinations, time.time())
+        semaphore = asyncio.Semaphore(self.config.post_config.max_concurrent_sends)
+        sends: Set[asyncio.Task] = set()
         
+        # Loop principal: aguarda mensagens indefinidamente e dispara os destinos no horário
         # Contador para reduzir logs de "nenhuma mensagem"
         no_message_count = 0
         
         while not self._stop_flag:
-            # Obtém mensagens do canal de estoque (apenas mensagens armazenadas via polling)
-            messages = await self.get_channel_messages(channel_id)
+            # Destinos alterados durante a execução
+            if self.config.destination_channels is not destinations:
+                destinations = self.config.destination_channels
+                scheduler.sync_channels(destinations, time.time())
+                self._finish_entries(scheduler)
+            
+            due = scheduler.next_due()
+            if due is None and not scheduler.busy:
+                # Não há mensagens - RESETA contadores para garantir que não mostre valores antigos
+                if self.total_posts > 0 or self.current_progress > 0:
+                    self._update_progress(0, 0, 0)
+                
+                no_message_count += 1
+                if no_message_count == 1:
+                    self._log("⏳ Aguardando mensagens do canal de estoque...", "info")
+                    self._log("💡 Dica: Envie os vídeos/fotos para o canal de estoque - eles serão processados automaticamente quando recebidos", "info")
+                else:
+                    # Log a cada minuto sem mensagens
+                    self._log(f"⏳ Ainda aguardando mensagens... O sistema está monitorando o canal via {'webhook' if self.webhook_url else 'polling'}", "info")
+                
+                # Dorme até chegar uma mensagem (ou até 1 minuto, para o log acima)
+                units = await self._wait_intake(timeout=60)
+            else:
+                # Único timer: dorme até o próximo destino vencer (ou até chegar mensagem/terminar envio)
+                timeout = 60 if due is None else due - time.time()
+                units = await self._wait_intake(timeout) if timeout > 0 else self._drain_intake()
+            if units and self.repost_queue:
+                self.repost_queue.flush()  # Grava a leva recebida numa única transação
             
-            # Filtra apenas mensagens com conteúdo válido e que ainda não foram processadas
-            valid_messages = [
-                msg for msg in messages 
-                if (msg.video or msg.photo or msg.document or msg.text) 
-                and msg.message_id not in processed_message_ids
-            ]
+            # Filtra apenas mensagens com conteúdo válido, ainda não postadas e não removidas da fila
+            # Cada item é uma postagem: uma mensagem avulsa ou um álbum inteiro
+            # A rota de cada postagem vem da tabela de roteamento (rotas removidas são descartadas)
+            routing = self.routing
+            valid_messages = []
+            for storage_key, unit in units:
+                route = routing.get(storage_key)
+                if route is None:
+                    continue
+                unit = [
+                    msg for msg in unit
+                    if msg.is_postable and not msg.posted and route.accepts(msg.media_kind)
+                    and self.message_store.get(route.key, msg.message_id) is msg
+                ]
+                if unit and route.destinations is not None and not scheduler.has_any(route.destinations):
+                    # Nenhum destino da rota está configurado: fica pendente em vez de contar como postada
+                    self._log(f"⚠️ Mensagem {unit[0].message_id} não postada: nenhum destino da rota do canal {route.stock_channel.channel_id} está configurado", "warning")
+                    continue
+                if unit:
+                    valid_messages.append((route, unit))
             
             if valid_messages:
                 # Reset contador quando encontra mensagens
                 no_message_count = 0
-                # Há mensagens para processar
                 num_messages = len(valid_messages)
-                num_channels = len(self.config.destination_channels)
-                total_operations = num_messages * num_channels
                 self._log(f"📨 {num_messages} nova(s) mensagem(ns) encontrada(s) para postar", "info")
-                self._log(f"📊 Total de {total_operations} postagem(ns) a realizar em {num_channels} canal{'is' if num_channels != 1 else ''}", "info")
                 # Conta apenas o número de mensagens, não o total de operações
-                self.total_posts = num_messages
+                self.total_posts += num_messages
                 
-                # Processa cada mensagem
-                for msg_idx, message in enumerate(valid_messages, 1):
-                    if self._stop_flag:
-                        self._log("Postagem interrompida pelo usuário", "warning")
-                        break
-                    
-                    # Marca mensagem como processada
-                    processed_message_ids.add(message.message_id)
+                now = time.time()
+                num_operations = 0
+                for route, unit in valid_messages:
+                    # Processa mensagem com o PostProcessor da rota (álbuns viram uma única postagem)
+                    message = unit[0]
+                    self._post_counter += 1
+                    if len(unit) > 1:
+                        message_data = route.processor.process_group(unit, self._post_counter)
+                    else:
+                        message_data = route.processor.process_message(message, self._post_counter)
+                    message_data['route'] = route
                     
-                    # Processa mensagem
-                    message_data = PostProcessor.process_message(message, self.config.post_config)
+                    # Retomada: pula destinos que já receberam a mensagem antes de um reinício
+                    if self.repost_queue:
+                        delivered = self.repost_queue.delivered_channels(route.key, message.message_id)
+                    else:
+                        delivered = self._partial_deliveries.get((route.key, message.message_id), set())
+                    if delivered:
+                        self._log(f"↩️ Retomando mensagem {message.message_id}: {len(delivered)} destino(s) já recebido(s)", "info")
                     
-                    # Posta em cada canal de destino
-                    for channel_idx, channel in enumerate(self.config.destination_channels):
-                        if self._stop_flag:
-                            break
-                        
-                        success = await self.post_to_channel(channel.channel_id, message_data)
-                        
-                        # Atualiza estatísticas
-                        self._update_channel_stats(channel.channel_id, channel.name, success)
-                        
-                        # Calcula delay apenas entre mensagens diferentes, não entre canais da mesma mensagem
-                        is_last_channel = channel_idx == len(self.config.destination_channels) - 1
-                        is_last_message = msg_idx == len(valid_messages)
-                        
-                        # Calcula delay para próxima mensagem
-                        if is_last_channel and not is_last_message:
-                            delay = random.randint(
-                                self.config.post_config.delay_min,
-                                self.config.post_config.delay_max
-                            )
-                        else:
-                            delay = 0
-                        
-                        # Log com status de sucesso/falha e tempo até próxima postagem
-                        if success:
-                            self._total_posts_ever += 1  # Incrementa total acumulado
-                            status_msg = f"✅ SUCESSO: Postado no canal '{channel.name}'"
-                            if delay > 0:
-                                status_msg += f" | Próxima postagem em {self._format_time(delay)}"
-                            self._log(status_msg, "success")
-                        else:
-                            self._total_failures_ever += 1  # Incrementa total de falhas acumulado
-                            error_msg = f"❌ FALHA: Erro ao postar no canal '{channel.name}'"
-                            if delay > 0:
-                                error_msg += f" | Próxima tentativa em {self._format_time(delay)}"
-                            self._log(error_msg, "error")
-                        
-                        # Incrementa progresso apenas quando termina de postar em TODOS os canais de uma mensagem
-                        if is_last_channel:
-                            self.current_progress += 1
-                            self._log(f"📊 Progresso: {self.current_progress}/{self.total_posts} mensagens processadas", "info")
-                        
-                        # Delay apenas após postar em todos os canais de uma mensagem
-                        if is_last_channel and not is_last_message:
-                            # Atualiza tempo restante (baseado em mensagens restantes, não operações)
-                            remaining_messages = len(valid_messages) - msg_idx
-                            # Usa o delay calculado para esta mensagem
-                            remaining = remaining_messages * delay
-                            self._update_progress(self.current_progress, self.total_posts, remaining)
-                            
-                            if not self._stop_flag:
-                                # Verifica se deve pular o delay
-                                if self._skip_next_delay:
-                                    self._skip_next_delay = False
-                                    self._log("⚡ Delay pulado - postando imediatamente", "info")
-                                else:
-                                    await asyncio.sleep(delay)
-                        elif is_last_channel:
-                            # Última mensagem - atualiza progresso final
-                            self._update_progress(self.current_progress, self.total_posts, 0)
-                        else:
-                            # Ainda processando canais da mesma mensagem - atualiza progresso sem delay
-                            remaining_messages = len(valid_messages) - msg_idx
-                            avg_delay = (self.config.post_config.delay_min + self.config.post_config.delay_max) // 2
-                            remaining = remaining_messages * avg_delay
-                            self._update_progress(self.current_progress, self.total_posts, remaining)
-                
-                # Após processar todas as mensagens, reseta o progresso e continua aguardando
-                self.current_progress = 0
-                self.total_posts = 0
-                self._update_progress(0, 0, 0)
-                self._log("✅ Todas as mensagens foram processadas. Aguardando novas mensagens...", "info")
-            else:
-                # Não há mensagens - RESETA contadores para garantir que não mostre valores antigos
-                if self.total_posts > 0 or self.current_progress > 0:
-                    self.current_progress = 0
-                    self.total_posts = 0
-                    self._update_progress(0, 0, 0)
-                
-                # Não há mensagens, aguarda um pouco antes de verificar novamente
-                no_message_count += 1
-                
-                # Log apenas a cada 12 tentativas (1 minuto) para evitar spam
-                if no_message_count == 1:
-                    self._log("⏳ Aguardando mensagens do canal de estoque...", "info")
-                    self._log("💡 Dica: Envie os vídeos/fotos para o canal de estoque - eles serão processados automaticamente quando recebidos", "info")
-                elif no_message_count % 12 == 0:
-                    # Log a cada minuto
-                    self._log("⏳ Ainda aguardando mensagens... O sistema está monitorando o canal via polling", "info")
-                
-                # Aguarda 5 segundos antes de verificar novamente
-                await asyncio.sleep(5)
+                    entry = scheduler.add_entry(unit, message_data, delivered, now, route.destinations)
+                    num_operations += len(entry.pending)
+                self._log(f"📊 Total de {num_operations} postagem(ns) a realizar", "info")
+                self._finish_entries(scheduler)
+            
+            # Dispara os destinos cujo horário chegou (em paralelo, limitado por max_concurrent_sends)
+            for cursor, entry in scheduler.pop_due(time.time()):
+                if self._stop_flag:
+                    break
+                task = asyncio.create_task(self._post_scheduled(scheduler, cursor, entry, semaphore))
+                sends.add(task)
+                task.add_done_callback(sends.discard)
+        
+        # Envios já iniciados terminam (os que ainda aguardam vaga desistem pela flag de parada)
+        if sends:
+            await asyncio.gather(*sends, return_exceptions=True)
+        self._scheduler = None
+        self._close_intake()
         
         # Se saiu do loop, foi porque o usuário parou
         if self._stop_flag:
@@ -616,6 +1051,7 @@ class TelegramBot:
         """Para o processo de postagem"""
         self._stop_flag = True
         self.status = PostStatus.STOPPED
+        self._push_intake(None, None)  # Acorda o loop se estiver aguardando mensagens
         # RESETA contadores da sessão ao parar
         self.current_progress = 0
         self.total_posts = 0
@@ -624,78 +1060,170 @@ class TelegramBot:
     
     def skip_next_delay(self):
         """Pula o próximo delay - força postagem imediata"""
-        self._skip_next_delay = True
+        if self._scheduler:
+            self._scheduler.skip_delays(time.time())
+            self._wake_posting_loop()
         self._log("⚡ Próxima postagem será imediata (delay pulado)", "info")
     
+    def clear_channel_messages(self, channel_id: str) -> int:
+        """Limpa as mensagens armazenadas de um canal"""
+        storage_key = self._storage_key(channel_id)
+        count = self.message_store.clear(storage_key)
+        if self.repost_queue:
+            self.repost_queue.clear(storage_key)
+        for key in [key for key in self._partial_deliveries if key[0] == storage_key]:
+            del self._partial_deliveries[key]
+        return count
+
     def clear_all_messages(self):
         """Limpa todas as mensagens armazenadas"""
-        count = sum(len(msgs) for msgs in self._stored_messages.values())
-        self._stored_messages.clear()
+        count = self.message_store.clear()
+        if self.repost_queue:
+            self.repost_queue.clear()
+        self._partial_deliveries.clear()
+        self._drain_intake()
         self._log(f"🗑️ {count} mensagem(ns) removida(s) da fila", "info")
         return count
 
     def get_status(self) -> dict:
-        """Retorna status atual"""
+        """Retorna status atual
+
+        Lê o último snapshot do progresso (sem lock e sem percorrer o agendador);
+        os tempos são descontados do tempo passado desde o snapshot.
+        """
+        snapshot = self.progress.snapshot
+        elapsed = max(0, int(time.time() - snapshot["updated_at"]))
+        next_post_in = snapshot["next_post_in"]
         return {
+            **snapshot,
             "status": self.status.value,
-            "current": self.current_progress,
-            "total": self.total_posts,
-            "remaining_time": self.remaining_time,
-            "total_posts_ever": self._total_posts_ever,  # Total acumulado
-            "total_failures_ever": self._total_failures_ever  # Total de falhas acumulado
+            "remaining_time": max(0, snapshot["remaining_time"] - elapsed),
+            "next_post_in": None if next_post_in is None else max(0, next_post_in - elapsed),
+            "duplicates_rejected": self.dedup_index.duplicates,  # Mensagens repetidas ignoradas
+            "rate_limiter": self.rate_limiter.snapshot()  # Níveis dos buckets de rate limit
         }
     
+    WEBHOOK_PATH = "/api/monitor/webhook"
+    UPDATE_TYPES = ["message", "channel_post"]
+
+    @property
+    def _webhook_endpoint(self) -> str:
+        """URL registrada no Telegram; o parâmetro `s` (impressão do segredo) muda se o segredo mudar"""
+        fingerprint = hashlib.sha256(self.webhook_secret.encode()).hexdigest()[:8]
+        return f"{self.webhook_url}{self.WEBHOOK_PATH}?s={fingerprint}"
+
+    @property
+    def application(self) -> Application:
+        """Application do PTB que despacha os updates para o message handler
+
+        Roda no mesmo loop da API (polling ou webhook), então compartilha o ExtBot e o pool HTTP.
+        """
+        if self._application is None:
+            builder = Application.builder().bot(self.bot)
+            if self.webhook_url:
+                builder = builder.updater(None)  # Updates chegam pela rota do webhook
+            self._application = builder.build()
+            # Importação tardia para evitar circular
+            from backend.bot.message_handler import setup_message_handler
+            setup_message_handler(self._application, self)
+        return self._application
+
+    def _intake_active(self) -> bool:
+        """Se o bot já está recebendo updates do Telegram"""
+        if self.webhook_url:
+            return self._webhook_active
+        application = self._application
+        return bool(application and application.updater and application.updater.running)
+
+    async def _start_intake(self):
+        """Inicia o recebimento de updates: webhook, se configurado, senão polling"""
+        if self.webhook_url:
+            await self._start_webhook()
+        else:
+            await self._start_polling()
+
+    async def _ensure_application_ready(self):
+        """Inicializa a Application no loop da API (modo webhook)"""
+        if self._application_ready:
+            return
+        async with self._application_lock:
+            if self._application_ready:
+                return
+            await self._ensure_bot_ready()
+            await self.application.initialize()
+            self._application_ready = True
+
+    async def _start_webhook(self):
+        """Registra o webhook no Telegram; os updates chegam pela rota WEBHOOK_PATH
+
+        Em deploys serverless cada cold start passa por aqui: se o webhook já está registrado
+        com a mesma URL, não registra de novo. Updates retidos pelo Telegram nunca são descartados.
+        """
+        if self._webhook_active:
+            return
+        try:
+            await self._ensure_application_ready()
+            endpoint = self._webhook_endpoint
+            info = await self.bot.get_webhook_info()
+            if info.url == endpoint and set(info.allowed_updates or ()) == set(self.UPDATE_TYPES):
+                self._webhook_active = True
+                self._log("Webhook já registrado - bot está recebendo updates do Telegram", "info")
+                return
+            await self.bot.set_webhook(
+                url=endpoint,
+                secret_token=self.webhook_secret,
+                allowed_updates=self.UPDATE_TYPES,
+                drop_pending_updates=False,
+            )
+            self._webhook_active = True
+            self._log("Webhook registrado - bot está recebendo updates do Telegram", "info")
+        except Exception as e:
+            self._log(f"Erro ao registrar webhook: {str(e)}", "error")
+            logger.error(f"Erro ao registrar webhook: {e}", exc_info=True)
+
+    async def process_webhook_update(self, data: dict):
+        """Entrega um update recebido pelo webhook ao message handler, no loop da API"""
+        await self._ensure_application_ready()
+        await self.application.process_update(Update.de_json(data, self.bot))
+
     async def _start_polling(self):
-        """Inicia polling em background para receber updates do Telegram"""
+        """Inicia o long polling no loop da API (sem thread nem event loop próprios)"""
         try:
-            if self._application:
-                # Verifica se já está rodando
-                try:
-                    if hasattr(self._application, '_running') and self._application._running:
-                        return
-                except:
-                    pass
-            
-            # Cria Application se não existir
-            if not self._application:
-                self._application = Application.builder().token(self.token).build()
-                # Importação tardia para evitar circular
-                from backend.bot.message_handler import setup_message_handler
-                setup_message_handler(self._application, self)
-            
-            # Inicia polling em background usando run_until_complete em thread separada
-            if not self._polling_task or self._polling_task.done():
-                def run_polling():
-                    try:
-                        self._application.run_polling(
-                            drop_pending_updates=True,
-                            allowed_updates=["message", "channel_post"],
-                            stop_signals=None  # Não para com sinais do sistema
-                        )
-                    except Exception as e:
-                        logger.error(f"Erro no polling: {e}", exc_info=True)
-                
-                # Executa polling em thread separada para não bloquear
-                import threading
-                polling_thread = threading.Thread(target=run_polling, daemon=True)
-                polling_thread.start()
-                self._polling_task = asyncio.create_task(asyncio.sleep(0))  # Task dummy para controle
-                self._log("Polling iniciado - bot está recebendo updates do Telegram", "info")
+            if self._intake_active():
+                return
+            await self._ensure_application_ready()
+            application = self.application
+            if not application.running:
+                await application.start()  # Despacha os updates da update_queue para os handlers
+            await application.updater.start_polling(
+                # Com fila persistente, processa o que chegou enquanto o bot estava fora
+                drop_pending_updates=self.repost_queue is None,
+                allowed_updates=self.UPDATE_TYPES,
+            )
+            self._log("Polling iniciado - bot está recebendo updates do Telegram", "info")
         except Exception as e:
             self._log(f"Erro ao iniciar polling: {str(e)}", "error")
             logger.error(f"Erro ao iniciar polling: {e}", exc_info=True)
     
-    async def _stop_polling(self):
-        """Para o polling"""
+    async def _stop_intake(self):
+        """Para o polling e encerra a Application (no modo webhook, o webhook continua registrado)"""
+        application = self._application
+        if application is None:
+            return
         try:
-            if self._application:
-                try:
-                    await self._application.stop()
-                    self._log("Polling parado", "info")
-                except Exception as e:
-                    logger.error(f"Erro ao parar application: {e}")
+            if application.updater and application.updater.running:
+                await application.updater.stop()
+                self._log("Polling parado", "info")
+            if application.running:
+                await application.stop()
+            if self._application_ready:
+                self._application_ready = False
+                self._webhook_active = False
+                # Também fecha o ExtBot compartilhado
+                await application.shutdown()
+                self._bot_ready = False
         except Exception as e:
-            logger.error(f"Erro ao parar polling: {e}")
+            logger.error(f"Erro ao parar recebimento de updates: {e}")
     
     def _update_channel_stats(self, channel_id: str, channel_name: str, success: bool):
         """Atualiza estatísticas de um canal"""
@@ -777,10 +1305,33 @@ class TelegramBot:
         }
     
     async def initialize(self):
-        """Inicializa o bot e inicia polling"""
-        await self._start_polling()
+        """Inicializa o bot (abre o cliente HTTP) e inicia o recebimento de updates (polling ou webhook)"""
+        try:
+            await self._ensure_bot_ready()
+        except Exception as e:
+            self._log(f"Erro ao inicializar cliente do bot: {str(e)}", "error")
+        await self._start_intake()
     
     async def shutdown(self):
-        """Desliga o bot e para polling"""
+        """Desliga o bot, para polling e fecha o cliente HTTP"""
         await self.stop_posting()
-        await self._stop_polling()
+        # Envios em andamento terminam (e registram a entrega) antes de fechar o cliente e a fila
+        task = self._posting_task
+        if task is not None and not task.done():
+            try:
+                await task
+            except Exception as e:
+                logger.error(f"Erro ao encerrar postagens: {e}")
+        await self._stop_intake()
+        try:
+            if self._bot_ready:
+                self._bot_ready = False
+                await self.bot.shutdown()
+        except Exception as e:
+            logger.error(f"Erro ao fechar cliente do bot: {e}")
+        await self.media_relay.close()
+        self.progress.close()
+        self.file_id_cache.flush()
+        self.dedup_index.flush()
+        if self.repost_queue:
+            self.repost_queue.close()
@@ -0,0 +1,88 @@
+"""
+Templates de postagem com variáveis: compilados uma vez, renderizados em uma passada por mensagem
+"""
+import re
+from typing import Any, Dict, FrozenSet
+
+# Variáveis aceitas em PostConfig.template_text
+TEMPLATE_FIELDS = ("original", "date", "channel_name", "media_type", "counter")
+
+# Valor de {media_type} para cada tipo de mídia armazenado
+MEDIA_TYPE_LABELS = {
+    "video": "vídeo",
+    "animation": "GIF",
+    "photo": "foto",
+    "document": "documento",
+    "text": "texto",
+}
+
+# {{ e }} são chaves literais; {nome} é uma variável; chaves soltas ficam como estão
+_TOKEN = re.compile(r"\{\{|\}\}|\{([^{}]*)\}")
+
+
+class TemplateError(ValueError):
+    """Template inválido (variável desconhecida ou mal formada)"""
+
+
+class CompiledTemplate:
+    """Template já analisado: `render` é um único str.format_map sobre o texto pré-processado
+
+    O texto literal do template é HTML escrito pelo usuário e vai como está; os valores
+    das variáveis devem chegar já escapados (parse_mode='HTML').
+    """
+
+    __slots__ = ("source", "fields", "_format")
+
+    def __init__(self, source: str):
+        self.source = source
+        fields = set()
+        parts = []
+        position = 0
+        for match in _TOKEN.finditer(source):
+            parts.append(self._literal(source[position:match.start()]))
+            token = match.group(0)
+            if token in ("{{", "}}"):
+                parts.append(token)  # Já é o escape de chave literal do format
+            else:
+                name = match.group(1).strip()
+                if name not in TEMPLATE_FIELDS:
+                    raise TemplateError(
+                        f"Variável desconhecida no template: {token} "
+                        f"(disponíveis: {', '.join('{' + f + '}' for f in TEMPLATE_FIELDS)})"
+                    )
+                fields.add(name)
+                parts.append("{" + name + "}")
+            position = match.end()
+        parts.append(self._literal(source[position:]))
+        self.fields: FrozenSet[str] = frozenset(fields)
+        self._format = "".join(parts)
+
+    @staticmethod
+    def _literal(text: str) -> str:
+        return text.replace("{", "{{").replace("}", "}}")
+
+    @property
+    def embeds_original(self) -> bool:
+        """Se o template posiciona o texto original com {original}"""
+        return "original" in self.fields
+
+    def render(self, values: Dict[str, Any]) -> str:
+        return self._format.format_map(values)
+
+
+def escape_unknown_placeholders(source: str) -> str:
+    """Torna literais as chaves que não são variáveis conhecidas ({PROMO} -> {{PROMO}})
+
+    Para templates salvos antes das variáveis, em que chaves eram sempre texto.
+    """
+    def escape(match: "re.Match") -> str:
+        token = match.group(0)
+        if token in ("{{", "}}") or match.group(1).strip() in TEMPLATE_FIELDS:
+            return token
+        return "{" + token + "}"
+    return _TOKEN.sub(escape, source or "")
+
+
+def compile_template(source: str) -> CompiledTemplate:
+    """Analisa o template (levanta TemplateError se for inválido)"""
+    return CompiledTemplate(source or "")
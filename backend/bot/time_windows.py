@@ -0,0 +1,205 @@
+"""
+Janelas de postagem e horários silenciosos (recorrentes por dia, em um fuso horário)
+"""
+import re
+from bisect import bisect_right
+from datetime import datetime, time as dt_time, timedelta
+from typing import List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+_DAY = 24 * 3600
+_SPEC = re.compile(r"^\s*(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*$")
+
+
+def parse_window(spec: str) -> Tuple[int, int]:
+    """Converte 'HH:MM-HH:MM' em (início, fim) em segundos do dia; fim < início cruza a meia-noite"""
+    match = _SPEC.match(spec)
+    if not match:
+        raise ValueError(f"Janela inválida '{spec}' (use HH:MM-HH:MM)")
+    h1, m1, h2, m2 = (int(g) for g in match.groups())
+    if h1 > 23 or h2 > 24 or m1 > 59 or m2 > 59 or (h2 == 24 and m2):
+        raise ValueError(f"Horário inválido em '{spec}'")
+    start, end = h1 * 3600 + m1 * 60, h2 * 3600 + m2 * 60
+    if start == end:
+        raise ValueError(f"Janela vazia '{spec}'")
+    return start, end
+
+
+def validate_timezone(name: str) -> str:
+    try:
+        ZoneInfo(name)
+    except Exception:
+        raise ValueError(f"Fuso horário desconhecido '{name}'")
+    return name
+
+
+class DailyWindows:
+    """Intervalos diários permitidos em um fuso; `next_allowed` é uma busca binária"""
+
+    def __init__(self, specs: Sequence[str], tz: ZoneInfo, blocked: bool = False):
+        self.tz = tz
+        intervals: List[Tuple[int, int]] = []
+        for spec in specs:
+            start, end = parse_window(spec)
+            if end > start:
+                intervals.append((start, end))
+            else:
+                # Cruza a meia-noite: divide em duas partes
+                intervals += [(start, _DAY), (0, end)]
+        merged = self._merge(intervals)
+        if blocked:
+            # Horários silenciosos: permitido é o complemento
+            merged = self._complement(merged)
+        self._starts = [start for start, _ in merged]
+        self._ends = [end for _, end in merged]
+
+    @staticmethod
+    def _merge(intervals: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        merged: List[Tuple[int, int]] = []
+        for start, end in sorted(i for i in intervals if i[0] < i[1]):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    @staticmethod
+    def _complement(intervals: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        result, cursor = [], 0
+        for start, end in intervals:
+            if start > cursor:
+                result.append((cursor, start))
+            cursor = end
+        if cursor < _DAY:
+            result.append((cursor, _DAY))
+        return result
+
+    @property
+    def never(self) -> bool:
+        return not self._starts
+
+    @property
+    def intervals(self) -> List[Tuple[int, int]]:
+        """Intervalos permitidos do dia (segundos, no fuso da agenda)"""
+        return list(zip(self._starts, self._ends))
+
+    def utc_offset(self, ts: float) -> float:
+        return datetime.fromtimestamp(ts, self.tz).utcoffset().total_seconds()
+
+    def next_allowed(self, ts: float) -> Optional[float]:
+        """Primeiro instante permitido a partir de `ts` (None se nunca é permitido)"""
+        if self.never:
+            return None
+        local = datetime.fromtimestamp(ts, self.tz)
+        second = local.hour * 3600 + local.minute * 60 + local.second + local.microsecond / 1e6
+        idx = bisect_right(self._starts, second) - 1
+        if idx >= 0 and second < self._ends[idx]:
+            return ts
+        day = local.date()
+        if idx + 1 < len(self._starts):
+            start = self._starts[idx + 1]
+        else:
+            day += timedelta(days=1)
+            start = self._starts[0]
+        opening = datetime.combine(day, dt_time(), tzinfo=self.tz) + timedelta(seconds=start)
+        return max(ts, opening.timestamp())
+
+
+class PostingWindows:
+    """Quando um canal pode postar: janelas do canal (ou globais) fora dos horários silenciosos globais"""
+
+    # Limite de alternâncias entre as duas agendas antes de desistir (combinação impossível)
+    _MAX_STEPS = 32
+
+    def __init__(
+        self,
+        windows: Sequence[str],
+        timezone: str,
+        quiet_hours: Sequence[str] = (),
+        quiet_timezone: Optional[str] = None,
+    ):
+        self.windows = DailyWindows(windows, ZoneInfo(timezone)) if windows else None
+        self.quiet = (
+            DailyWindows(quiet_hours, ZoneInfo(quiet_timezone or timezone), blocked=True)
+            if quiet_hours else None
+        )
+        self._lengths: Optional[List[int]] = None  # Duração de cada período permitido do dia
+
+    @property
+    def unrestricted(self) -> bool:
+        return self.windows is None and self.quiet is None
+
+    def next_slot(self, ts: float) -> Optional[float]:
+        """Próximo instante >= ts em que o canal pode postar (None se nunca)"""
+        for _ in range(self._MAX_STEPS):
+            candidate = ts
+            if self.windows is not None:
+                candidate = self.windows.next_allowed(candidate)
+                if candidate is None:
+                    return None
+            if self.quiet is not None:
+                candidate = self.quiet.next_allowed(candidate)
+                if candidate is None:
+                    return None
+            if candidate == ts:
+                return ts
+            ts = candidate
+        return None
+
+    def post_interval(self, delay: float) -> float:
+        """Tempo médio entre postagens espaçadas por `delay`, contando os períodos fechados (previsões)
+
+        Um período permitido de W segundos comporta W // delay + 1 postagens por dia.
+        Aproximação: mudanças de horário de verão são ignoradas.
+        """
+        if self.unrestricted or delay <= 0:
+            return delay
+        if self._lengths is None:
+            self._lengths = self._allowed_lengths()
+        if not self._lengths:
+            return delay
+        per_day = sum(length // delay + 1 for length in self._lengths)
+        return max(delay, _DAY / per_day)
+
+    def _allowed_lengths(self) -> List[int]:
+        """Durações dos períodos em que janelas e horários silenciosos permitem postar"""
+        allowed = self.windows.intervals if self.windows is not None else [(0, _DAY)]
+        if self.quiet is not None:
+            quiet = self.quiet.intervals
+            if self.windows is not None:
+                # Leva a agenda silenciosa para o fuso das janelas (diferença atual entre os fusos)
+                now = datetime.now().timestamp()
+                quiet = _shift(quiet, self.windows.utc_offset(now) - self.quiet.utc_offset(now))
+            allowed = _intersect(allowed, quiet)
+        lengths = [end - start for start, end in allowed]
+        # Período que cruza a meia-noite é um só
+        if len(allowed) > 1 and allowed[0][0] == 0 and allowed[-1][1] == _DAY:
+            lengths[0] += lengths.pop()
+        return lengths
+
+
+def _shift(intervals: List[Tuple[int, int]], offset: float) -> List[Tuple[int, int]]:
+    """Desloca intervalos do dia em `offset` segundos, dividindo o que passar da meia-noite"""
+    shifted = []
+    for start, end in intervals:
+        begin = int(start + offset) % _DAY
+        finish = begin + end - start
+        if finish > _DAY:
+            shifted += [(begin, _DAY), (0, finish - _DAY)]
+        else:
+            shifted.append((begin, finish))
+    return DailyWindows._merge(shifted)
+
+
+def _intersect(a: List[Tuple[int, int]], b: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Interseção de duas listas ordenadas de intervalos"""
+    result, i, j = [], 0, 0
+    while i < len(a) and j < len(b):
+        start, end = max(a[i][0], b[j][0]), min(a[i][1], b[j][1])
+        if start < end:
+            result.append((start, end))
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return result
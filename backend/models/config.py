@@ -1,4 +1,5 @@
-from pydantic import BaseModel, Field, model_validator
+import re
+from pydantic import BaseModel, Field, field_validator, model_validator
 from typing import List, Optional
 from enum import Enum
 
@@ -10,9 +11,43 @@ class PostStatus(str, Enum):
     COMPLETED = "completed"
 
 
+def _validate_windows(windows: Optional[List[str]]) -> Optional[List[str]]:
+    """Janelas no formato HH:MM-HH:MM"""
+    from backend.bot.time_windows import parse_window
+    for spec in windows or ():
+        parse_window(spec)
+    return windows
+
+
+def _validate_timezone(timezone: Optional[str]) -> Optional[str]:
+    from backend.bot.time_windows import validate_timezone
+    return validate_timezone(timezone) if timezone is not None else timezone
+
+
 class ChannelConfig(BaseModel):
     channel_id: str = Field(..., description="ID do canal (ex: @estoque)")
     name: str = Field(..., description="Nome do canal")
+    delay_min: Optional[int] = Field(default=None, ge=1, description="Delay mínimo próprio do canal (padrão: o da PostConfig)")
+    delay_max: Optional[int] = Field(default=None, ge=1, description="Delay máximo próprio do canal (padrão: o da PostConfig)")
+    posting_windows: Optional[List[str]] = Field(default=None, description="Janelas de postagem do canal, ex: 08:00-23:00 (padrão: as da PostConfig)")
+    timezone: Optional[str] = Field(default=None, description="Fuso horário das janelas do canal (padrão: o da PostConfig)")
+
+    @model_validator(mode='after')
+    def validate_delay_range(self):
+        """Valida que delay_max >= delay_min quando os dois são definidos"""
+        if self.delay_min is not None and self.delay_max is not None and self.delay_max < self.delay_min:
+            raise ValueError(f"delay_max ({self.delay_max}) deve ser maior ou igual a delay_min ({self.delay_min})")
+        return self
+
+    @field_validator('posting_windows')
+    @classmethod
+    def validate_posting_windows(cls, windows: Optional[List[str]]):
+        return _validate_windows(windows)
+
+    @field_validator('timezone')
+    @classmethod
+    def validate_timezone(cls, timezone: Optional[str]):
+        return _validate_timezone(timezone)
 
 
 class PostConfig(BaseModel):
@@ -21,6 +56,11 @@ class PostConfig(BaseModel):
     button_url: Optional[str] = Field(default=None, description="URL do botão")
     delay_min: int = Field(default=3600, ge=1, description="Delay mínimo em segundos")
     delay_max: int = Field(default=3600, ge=1, description="Delay máximo em segundos")
+    max_concurrent_sends: int = Field(default=10, ge=1, le=100, description="Máximo de canais de destino postados simultaneamente")
+    strip_patterns: List[str] = Field(default_factory=list, description="Regex extras removidas do texto original")
+    timezone: str = Field(default="UTC", description="Fuso horário das janelas e da variável {date} (ex: America/Sao_Paulo)")
+    posting_windows: List[str] = Field(default_factory=list, description="Janelas diárias de postagem, ex: 08:00-23:00 (vazio = o dia todo)")
+    quiet_hours: List[str] = Field(default_factory=list, description="Horários sem postagem em nenhum canal, ex: 23:00-08:00")
 
     @model_validator(mode='after')
     def validate_delay_range(self):
@@ -29,9 +69,56 @@ class PostConfig(BaseModel):
             raise ValueError(f"delay_max ({self.delay_max}) deve ser maior ou igual a delay_min ({self.delay_min})")
         return self
 
+    @field_validator('template_text')
+    @classmethod
+    def validate_template_text(cls, template_text: str):
+        """Rejeita template com variável desconhecida ao salvar, não na hora de postar"""
+        from backend.bot.template import compile_template
+        compile_template(template_text)  # TemplateError é um ValueError
+        return template_text
+
+    @field_validator('posting_windows', 'quiet_hours')
+    @classmethod
+    def validate_windows(cls, windows: List[str]):
+        return _validate_windows(windows)
+
+    @field_validator('timezone')
+    @classmethod
+    def validate_timezone(cls, timezone: str):
+        return _validate_timezone(timezone)
+
+    @field_validator('strip_patterns')
+    @classmethod
+    def validate_strip_patterns(cls, patterns: List[str]):
+        """Rejeita regex inválida ao salvar, não na hora de postar"""
+        for pattern in patterns:
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                raise ValueError(f"Padrão inválido '{pattern}': {e}")
+        return patterns
+
+
+class StockRoute(BaseModel):
+    """Canal de estoque extra e para onde (e como) suas mensagens são repostadas"""
+    stock_channel: ChannelConfig = Field(..., description="Canal de estoque da rota")
+    destinations: Optional[List[str]] = Field(default=None, description="channel_id dos destinos da rota (padrão: todos)")
+    post_config: Optional[PostConfig] = Field(default=None, description="Template/botão próprios da rota (padrão: a PostConfig global)")
+    media_types: Optional[List[str]] = Field(default=None, description="Tipos aceitos: video, animation, photo, document, text (padrão: todos)")
+
+    @field_validator('media_types')
+    @classmethod
+    def validate_media_types(cls, media_types: Optional[List[str]]):
+        from backend.bot.message_store import POSTABLE_KINDS
+        for kind in media_types or ():
+            if kind not in POSTABLE_KINDS:
+                raise ValueError(f"Tipo de mídia desconhecido '{kind}' (use {', '.join(POSTABLE_KINDS)})")
+        return media_types
+
 
 class Config(BaseModel):
     stock_channel: Optional[ChannelConfig] = Field(default=None, description="Canal de estoque")
+    stock_routes: List[StockRoute] = Field(default_factory=list, description="Canais de estoque extras, cada um com seus destinos")
     destination_channels: List[ChannelConfig] = Field(default_factory=list, description="Canais de destino")
     post_config: PostConfig = Field(default_factory=PostConfig, description="Configuração de postagem")
     status: PostStatus = Field(default=PostStatus.IDLE, description="Status atual")
@@ -41,6 +128,7 @@ class LogEntry(BaseModel):
     timestamp: str
     message: str
     level: str = "info"  # info, success, error, warning
+    seq: Optional[int] = None  # Número de sequência no histórico (atribuído pela API)
 
 
 class PostProgress(BaseModel):
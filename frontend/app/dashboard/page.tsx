@@ -1,6 +1,6 @@
 'use client'
 
-import { useState, useEffect, useCallback } from 'react'
+import { useState, useEffect, useCallback, useRef } from 'react'
 import { Activity, PlayCircle, PauseCircle, Clock, TrendingUp, FileText, Timer, Power, AlertCircle, X, Download, Upload, Database } from 'lucide-react'
 import PostTemplate from '@/components/PostTemplate'
 import DelaySlider from '@/components/DelaySlider'
@@ -75,9 +75,9 @@ export default function DashboardPage() {
       
       // Carrega histórico de logs do backend
       try {
-        const history = await getLogHistory()
+        const history = await getLogHistory(undefined, 100) // Só os últimos 100 do histórico
         if (history && history.length > 0) {
-          const recentLogs = history.slice(-100) // Mantém últimos 100 do histórico
+          const recentLogs = history
           setLogs(recentLogs)
           // Salva no localStorage também
           try {
@@ -182,6 +182,9 @@ export default function DashboardPage() {
     }
   }, [progress])
 
+  // Último seq de log recebido: ao reconectar, o stream continua dali
+  const lastLogSeq = useRef<number | undefined>(undefined)
+
   // Função para conectar ao stream de logs
   const connectLogStream = useCallback(() => {
     let eventSource: EventSource | null = null
@@ -196,6 +199,9 @@ export default function DashboardPage() {
         eventSource = createLogStream((data) => {
           try {
             if ('timestamp' in data) {
+              if (data.seq !== undefined) {
+                lastLogSeq.current = data.seq
+              }
               setLogs((prev) => {
                 const newLogs = [...prev, data as LogEntry].slice(-100)
                 return newLogs
@@ -226,7 +232,7 @@ export default function DashboardPage() {
           } catch (error) {
             console.error('Erro ao processar dados do stream:', error)
           }
-        })
+        }, lastLogSeq.current)
 
         eventSource.onopen = () => {
           console.log('Stream de logs conectado')
@@ -316,10 +322,15 @@ export default function DashboardPage() {
     return () => clearInterval(interval)
   }, [loading, updateStatus])
 
+  // Lança o erro da API (ex.: 422 com as variáveis disponíveis) para o template exibir
+  const savePostConfig = async (postConfig: Config['post_config']) => {
+    await setPostConfig(postConfig)
+    setConfig((prev) => ({ ...prev, post_config: postConfig }))
+  }
+
   const handlePostConfigChange = async (postConfig: Config['post_config']) => {
     try {
-      await setPostConfig(postConfig)
-      setConfig((prev) => ({ ...prev, post_config: postConfig }))
+      await savePostConfig(postConfig)
     } catch (error) {
       console.error('Erro ao salvar configuração de postagem:', error)
     }
@@ -528,7 +539,7 @@ export default function DashboardPage() {
         <div className="lg:col-span-1">
           <PostTemplate
             config={config.post_config}
-            onChange={handlePostConfigChange}
+            onChange={savePostConfig}
           />
         </div>
         <div className="lg:col-span-1">
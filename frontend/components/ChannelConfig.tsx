@@ -19,6 +19,7 @@ export default function ChannelConfig({ channel, onChange }: ChannelConfigProps)
 
   const handleChange = (field: 'channel_id' | 'name', value: string) => {
     onChange({
+      ...channel,
       channel_id: field === 'channel_id' ? value : channel?.channel_id || '',
       name: field === 'name' ? value : channel?.name || '',
     })
@@ -108,7 +108,7 @@ export default function ChannelListWithStats({ channels, onChange }: ChannelList
     if (editingId && editValues.id.trim()) {
       const updatedChannels = channels.map(c => 
         c.channel_id === editingId
-          ? { channel_id: editValues.id.trim(), name: editValues.name.trim() || editValues.id.trim() }
+          ? { ...c, channel_id: editValues.id.trim(), name: editValues.name.trim() || editValues.id.trim() }
           : c
       )
       onChange(updatedChannels)
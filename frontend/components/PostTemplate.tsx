@@ -1,20 +1,67 @@
 'use client'
 
+import { useEffect, useRef, useState } from 'react'
 import { Card, CardContent, CardHeader, CardTitle, CardDescription } from '@/components/ui/card'
 import { Input } from '@/components/ui/input'
 import { Label } from '@/components/ui/label'
 import { PostConfig } from '@/lib/api'
-import { FileText, Link2 } from 'lucide-react'
+import { AlertCircle, FileText, Link2 } from 'lucide-react'
 import RichTextEditor from '@/components/RichTextEditor'
 
 interface PostTemplateProps {
   config: PostConfig
-  onChange: (config: PostConfig) => void
+  onChange: (config: PostConfig) => Promise<void>
 }
 
+// Espera após a última tecla antes de salvar o texto do template
+const SAVE_DELAY_MS = 800
+
 export default function PostTemplate({ config, onChange }: PostTemplateProps) {
+  // Rascunho local: o texto digitado não depende de o salvamento ser aceito pela API
+  const [templateText, setTemplateText] = useState(config.template_text)
+  const [saveError, setSaveError] = useState<string | null>(null)
+  const saveTimer = useRef<ReturnType<typeof setTimeout> | null>(null)
+  const configRef = useRef(config)
+  configRef.current = config
+
+  // Texto alterado fora do editor (ex.: importação) substitui o rascunho se não houver edição pendente
+  useEffect(() => {
+    if (!saveTimer.current) setTemplateText(config.template_text)
+  }, [config.template_text])
+
+  useEffect(() => () => {
+    if (saveTimer.current) clearTimeout(saveTimer.current)
+  }, [])
+
+  const save = async (next: PostConfig) => {
+    try {
+      await onChange(next)
+      setSaveError(null)
+    } catch (error) {
+      setSaveError(error instanceof Error ? error.message : String(error))
+    }
+  }
+
+  const saveTemplateText = (text: string) => {
+    if (saveTimer.current) {
+      clearTimeout(saveTimer.current)
+      saveTimer.current = null
+    }
+    if (text === configRef.current.template_text) {
+      setSaveError(null)
+      return
+    }
+    save({ ...configRef.current, template_text: text })
+  }
+
+  const handleTemplateChange = (text: string) => {
+    setTemplateText(text)
+    if (saveTimer.current) clearTimeout(saveTimer.current)
+    saveTimer.current = setTimeout(() => saveTemplateText(text), SAVE_DELAY_MS)
+  }
+
   const handleChange = (field: keyof PostConfig, value: string | number) => {
-    onChange({
+    save({
       ...config,
       [field]: value,
     })
@@ -35,11 +82,18 @@ export default function PostTemplate({ config, onChange }: PostTemplateProps) {
         <div className="space-y-2 p-3 rounded-2xl bg-primary/10 border border-primary/20 shadow-md">
           <Label htmlFor="template-text">Texto padrão do post</Label>
           <RichTextEditor
-            value={config.template_text}
-            onChange={(value) => handleChange('template_text', value)}
+            value={templateText}
+            onChange={handleTemplateChange}
+            onBlur={() => saveTemplateText(templateText)}
             placeholder="Digite o texto que será adicionado antes da mensagem original... Use os botões acima para formatar!"
             rows={6}
           />
+          {saveError && (
+            <p className="flex items-start gap-1 text-xs text-destructive whitespace-pre-line">
+              <AlertCircle className="h-3 w-3 mt-0.5 shrink-0" />
+              {saveError}
+            </p>
+          )}
           <p className="text-xs text-muted-foreground">
             Este texto será adicionado no início de cada mensagem repostada. Suporta formatação HTML do Telegram (negrito, itálico, links, emojis, etc.)
           </p>
@@ -19,6 +19,7 @@ import { cn } from '@/lib/utils'
 interface RichTextEditorProps {
   value: string
   onChange: (value: string) => void
+  onBlur?: () => void
   placeholder?: string
   rows?: number
   className?: string
@@ -27,6 +28,7 @@ interface RichTextEditorProps {
 export default function RichTextEditor({
   value,
   onChange,
+  onBlur,
   placeholder = 'Digite seu texto...',
   rows = 4,
   className
@@ -286,6 +288,7 @@ export default function RichTextEditor({
           ref={textareaRef}
           value={value}
           onChange={(e) => onChange(e.target.value)}
+          onBlur={onBlur}
           placeholder={placeholder}
           rows={rows}
           className="resize-none rounded-xl border-primary/20 font-mono text-sm"
@@ -19,6 +19,10 @@ const API_BASE_URL = getApiBaseUrl()
 export interface ChannelConfig {
   channel_id: string
   name: string
+  delay_min?: number
+  delay_max?: number
+  posting_windows?: string[]
+  timezone?: string
 }
 
 export interface PostConfig {
@@ -27,10 +31,23 @@ export interface PostConfig {
   button_url?: string
   delay_min: number
   delay_max: number
+  max_concurrent_sends?: number
+  strip_patterns?: string[]
+  timezone?: string
+  posting_windows?: string[]
+  quiet_hours?: string[]
+}
+
+export interface StockRoute {
+  stock_channel: ChannelConfig
+  destinations?: string[] | null
+  post_config?: PostConfig | null
+  media_types?: string[] | null
 }
 
 export interface Config {
   stock_channel?: ChannelConfig
+  stock_routes?: StockRoute[]
   destination_channels: ChannelConfig[]
   post_config: PostConfig
   status: string
@@ -40,12 +57,15 @@ export interface LogEntry {
   timestamp: string
   message: string
   level: string
+  seq?: number
 }
 
 export interface Progress {
   current: number
   total: number
   remaining_time: number
+  next_post_in?: number | null
+  duplicates_rejected?: number
   status: string
 }
 
@@ -118,13 +138,23 @@ export async function setDestinationChannels(channels: ChannelConfig[]): Promise
   if (!response.ok) throw new Error('Failed to set destination channels')
 }
 
+// Mensagem de erro da API: `detail` de HTTPException ou as mensagens da validação (422)
+async function errorDetail(response: Response, fallback: string): Promise<string> {
+  const error = await response.json().catch(() => null)
+  const detail = error?.detail
+  if (Array.isArray(detail)) {
+    return detail.map((item) => String(item.msg ?? item).replace(/^Value error, /, '')).join('\n') || fallback
+  }
+  return detail || fallback
+}
+
 export async function setPostConfig(postConfig: PostConfig): Promise<void> {
   const response = await fetch(`${API_BASE_URL}/api/config/post-config`, {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify(postConfig),
   })
-  if (!response.ok) throw new Error('Failed to set post config')
+  if (!response.ok) throw new Error(await errorDetail(response, 'Failed to set post config'))
 }
 
 export async function startPosting(): Promise<void> {
@@ -161,8 +191,10 @@ export async function getStatus(): Promise<Progress> {
   }
 }
 
-export function createLogStream(callback: (log: LogEntry | Progress) => void): EventSource {
-  const eventSource = new EventSource(`${API_BASE_URL}/api/logs/stream`)
+export function createLogStream(callback: (log: LogEntry | Progress) => void, since?: number): EventSource {
+  // Com since, o backend reenvia os logs perdidos desde o último seq recebido
+  const query = since !== undefined ? `?since=${since}` : ''
+  const eventSource = new EventSource(`${API_BASE_URL}/api/logs/stream${query}`)
   
   eventSource.onmessage = (event) => {
     try {
@@ -178,6 +210,12 @@ export function createLogStream(callback: (log: LogEntry | Progress) => void): E
         return
       }
       
+      // Reenvio maior que a fila do servidor: os logs omitidos ficam em /api/logs/history
+      if (data.type === 'replay_truncated') {
+        console.warn(`Stream de logs: ${data.skipped} logs antigos omitidos (seq ${data.since + 1}-${data.until})`)
+        return
+      }
+      
       // Verifica se é progresso
       if (data.type === 'progress') {
         const progressData: Progress = {
@@ -223,8 +261,12 @@ export async function getChannelStatsSummary(): Promise<ChannelStatsSummary> {
   return response.json()
 }
 
-export async function getLogHistory(): Promise<LogEntry[]> {
-  const response = await fetch(`${API_BASE_URL}/api/logs/history`)
+export async function getLogHistory(since?: number, limit?: number): Promise<LogEntry[]> {
+  const params = new URLSearchParams()
+  if (since !== undefined) params.set('since', String(since))
+  if (limit !== undefined) params.set('limit', String(limit))
+  const query = params.toString()
+  const response = await fetch(`${API_BASE_URL}/api/logs/history${query ? `?${query}` : ''}`)
   if (!response.ok) throw new Error('Failed to get log history')
   return response.json()
 }